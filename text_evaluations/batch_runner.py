@@ -0,0 +1,275 @@
+"""
+Batch Runner
+
+Offline alternative to prompt_runner.py for large sweeps: instead of one
+request per row, the rows of the prompts CSV are packed into provider batch
+jobs (Anthropic Message Batches, OpenAI Batch API), which are polled until
+they finish and whose results are scattered back into the `*_response`
+columns. Batch jobs are cheaper than live requests and are not subject to the
+per-minute rate limits.
+
+Submitted batch ids, and the requests each batch holds, are recorded in
+`<output>.batches.json`, so an interrupted run picks up the same jobs again
+instead of paying for them twice, and submits only the requests that no
+recorded batch covers. The output is written, and the state file removed, only
+once every request has a result; requests left without one (e.g. by a batch
+that failed or expired) raise IncompleteBatchError and are submitted again by
+the next run.
+Responses already in the cache (or, with resume=True, in the previous output)
+are not resubmitted, and rows sharing a prompt share one request per sample,
+as in prompt_runner.py.
+
+LocalBatchServer stands in for a provider's batch endpoint; the fake
+provider uses it so the whole flow can be exercised offline.
+"""
+
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_grid import open_prompts
+from prompt_runner import (DEFAULT_SAMPLES, PARTIAL_SUFFIX, PROMPT_COLUMN_NAME, carry_over, drop_carry,
+                           has_response, row_key, sample_key)
+
+
+BATCH_STATE_SUFFIX = '.batches.json'
+
+# Anthropic accepts up to 100,000 requests per batch and OpenAI 50,000
+DEFAULT_MAX_BATCH_SIZE = 10000
+
+# Seconds between status checks of outstanding batches
+DEFAULT_POLL_INTERVAL = 60
+
+
+class IncompleteBatchError(RuntimeError):
+    """Some batch requests finished without any result."""
+
+
+class LocalBatchServer:
+    """
+    In-process stand-in for a provider batch endpoint.
+
+    Jobs are answered in a background thread by `answer(prompt)` after
+    `completion_delay` seconds; a failing request is reported as an error
+    result, like a real batch API would.
+    """
+
+    def __init__(self, answer, completion_delay=0.0, workers=4):
+        self.answer = answer
+        self.completion_delay = completion_delay
+        self.workers = workers
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def submit(self, requests):
+        batch_id = f"localbatch_{next(self.ids)}"
+        job = {'requests': list(requests), 'results': None, 'done': threading.Event()}
+        with self.lock:
+            self.jobs[batch_id] = job
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return batch_id
+
+    def _answer(self, prompt):
+        try:
+            return self.answer(prompt)
+        except Exception as e:
+            return f"Error: {e}"
+
+    def _run(self, job):
+        time.sleep(self.completion_delay)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            texts = list(executor.map(self._answer, [prompt for _, prompt in job['requests']]))
+        job['results'] = [(custom_id, text) for (custom_id, _), text in zip(job['requests'], texts)]
+        job['done'].set()
+
+    def done(self, batch_id):
+        return self.jobs[batch_id]['done'].is_set()
+
+    def results(self, batch_id):
+        job = self.jobs[batch_id]
+        if not job['done'].is_set():
+            raise RuntimeError(f"Batch '{batch_id}' has not finished yet.")
+        return iter(job['results'])
+
+
+def load_batch_state(path, input_path, row_count):
+    """
+    Load submitted batch ids from a previous run, if they belong to the same input.
+
+    Returns:
+        dict: Provider name -> list of {'id': batch id, 'custom_ids': requests in it}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, mode='r', encoding='utf-8') as infile:
+        state = json.load(infile)
+    if state.get('input') != os.path.abspath(input_path) or state.get('rows') != row_count:
+        print(f"Ignoring '{path}': it was written for a different input.")
+        return {}
+    # Older state files hold bare batch ids; their requests are unknown (None)
+    return {name: [batch if isinstance(batch, dict) else {'id': batch, 'custom_ids': None} for batch in batches]
+            for name, batches in state.get('batches', {}).items()}
+
+
+def save_batch_state(path, input_path, row_count, batches):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as outfile:
+        json.dump({'input': os.path.abspath(input_path), 'rows': row_count, 'batches': batches},
+                  outfile, indent=2)
+    os.replace(tmp_path, path)
+
+
+def request_groups(rows, provider, prompt_column=PROMPT_COLUMN_NAME, samples=DEFAULT_SAMPLES):
+    """
+    Group the rows still missing a response from `provider` by the request that answers them.
+
+    Args:
+        rows (list): Dict rows
+        provider: Provider adapter
+        prompt_column (str): Name of the column holding the prompt
+        samples (int): Requests per unique prompt; None gives every row its own request
+
+    Returns:
+        list: (request key, row indices) pairs, in order of each request's first row
+    """
+    groups = {}
+    uses = {}
+    for index, row in enumerate(rows):
+        if has_response(row.get(provider.response_column)):
+            continue
+        prompt = row[prompt_column]
+        key = sample_key(provider, prompt, 0)
+        if samples:
+            sample = uses.get(key, 0) % samples
+            uses[key] = uses.get(key, 0) + 1
+            key = sample_key(provider, prompt, sample) if sample else key
+        group = groups.setdefault(key if samples else (key, index), (key, []))
+        group[1].append(index)
+    return list(groups.values())
+
+
+def process_csv_batch(input_path, output_path, providers, prompt_column=PROMPT_COLUMN_NAME,
+                      resume=False, cache=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                      poll_interval=DEFAULT_POLL_INTERVAL, samples=DEFAULT_SAMPLES, cells=None):
+    """
+    Generate responses for every row of the prompts CSV (or grid spec) through provider batch jobs.
+
+    Args:
+        input_path (str): Path to the prompts CSV
+        output_path (str): Path of the CSV to write
+        providers (list): Provider adapters; each must have supports_batch
+        prompt_column (str): Name of the column holding the prompt
+        resume (bool): Reuse good responses from a previous output / checkpoint
+        cache (ResponseCache): Optional response cache; None bypasses caching
+        max_batch_size (int): Maximum number of requests per batch job
+        poll_interval (float): Seconds between status checks
+        samples (int): Requests per unique prompt; None sends one request per row
+        cells (tuple): Optional (start, stop) range of input rows to process
+
+    Returns:
+        int: Number of rows processed
+    """
+    unsupported = [provider.label for provider in providers if not provider.supports_batch]
+    if unsupported:
+        raise ValueError(f"Batch mode is not supported for: {', '.join(unsupported)}")
+
+    response_columns = [provider.response_column for provider in providers]
+    completed = carry_over(output_path, response_columns) if resume else {}
+
+    # Batch jobs need every row up front; use `cells` to split a large grid into several runs
+    with open_prompts(input_path, cells) as (input_columns, reader):
+        fieldnames = input_columns + [column for column in response_columns if column not in input_columns]
+        rows = list(reader)
+    for row in rows:
+        if completed:
+            row.update(completed.get(row_key(row), {}))
+
+    state_path = output_path + BATCH_STATE_SUFFIX
+    batches = load_batch_state(state_path, input_path, len(rows))
+
+    # Provider name -> custom id -> (request key, rows answered by that request)
+    fan_out = {}
+    for provider in providers:
+        column = provider.response_column
+        pending = []
+        for key, indices in request_groups(rows, provider, prompt_column, samples):
+            cached = cache.get(key) if cache is not None else None
+            if has_response(cached):
+                for index in indices:
+                    rows[index][column] = cached
+                continue
+            pending.append((key, indices))
+        fan_out[provider.name] = {f"row-{indices[0]}": (key, indices) for key, indices in pending}
+
+        recorded = batches.setdefault(provider.name, [])
+        if any(batch['custom_ids'] is None for batch in recorded):
+            covered = set(fan_out[provider.name])
+        else:
+            covered = {custom_id for batch in recorded for custom_id in batch['custom_ids']}
+        if recorded:
+            print(f"{provider.label}: reusing {len(recorded)} previously submitted batch(es).")
+        todo = [(key, indices) for key, indices in pending if f"row-{indices[0]}" not in covered]
+        for start in range(0, len(todo), max_batch_size):
+            chunk = todo[start:start + max_batch_size]
+            requests = [(f"row-{indices[0]}", rows[indices[0]][prompt_column]) for _, indices in chunk]
+            batch_id = provider.submit_batch(requests)
+            recorded.append({'id': batch_id, 'custom_ids': [custom_id for custom_id, _ in requests]})
+            print(f"{provider.label}: submitted batch {batch_id} with {len(chunk)} requests "
+                  f"for {sum(len(indices) for _, indices in chunk)} rows.")
+            # Record every batch as soon as it exists so a crash never resubmits it
+            save_batch_state(state_path, input_path, len(rows), batches)
+
+    answered = {provider.name: set() for provider in providers}
+    outstanding = [(provider, batch['id']) for provider in providers for batch in batches.get(provider.name, [])]
+    while outstanding:
+        still_running = []
+        for provider, batch_id in outstanding:
+            if not provider.batch_done(batch_id):
+                still_running.append((provider, batch_id))
+                continue
+            received = 0
+            for custom_id, text in provider.batch_results(batch_id):
+                first = int(custom_id.split('-', 1)[1])
+                key, indices = fan_out[provider.name].get(
+                    custom_id, (sample_key(provider, rows[first][prompt_column], 0), [first]))
+                for index in indices:
+                    rows[index][provider.response_column] = text
+                answered[provider.name].add(custom_id)
+                received += 1
+                if cache is not None and has_response(text):
+                    cache.put(key, provider.name, provider.model, text)
+            print(f"{provider.label}: batch {batch_id} finished with {received} results.")
+        outstanding = still_running
+        if outstanding:
+            print(f"Waiting for {len(outstanding)} batch(es)...")
+            time.sleep(poll_interval)
+
+    partial_path = output_path + PARTIAL_SUFFIX
+    with open(partial_path, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    missing = {provider.name: set(fan_out[provider.name]) - answered[provider.name] for provider in providers}
+    if any(missing.values()):
+        # Keep the checkpoint and the finished batches, but let the next run submit these again
+        for name, custom_ids in missing.items():
+            for batch in batches.get(name, []):
+                # A batch without recorded requests is dropped; --resume keeps what it answered
+                batch['custom_ids'] = [custom_id for custom_id in batch['custom_ids'] or []
+                                       if custom_id not in custom_ids]
+            batches[name] = [batch for batch in batches.get(name, []) if batch['custom_ids']]
+        save_batch_state(state_path, input_path, len(rows), batches)
+        counts = ', '.join(f"{name}: {len(custom_ids)}" for name, custom_ids in missing.items() if custom_ids)
+        raise IncompleteBatchError(f"Batch requests finished without a result ({counts}); the responses received "
+                                   f"are in '{partial_path}'. Rerun with --resume to submit the missing requests.")
+    os.replace(partial_path, output_path)
+    drop_carry(output_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return len(rows)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark
+
+Measures the throughput and peak memory of every pipeline stage without any
+API quota:
+
+- generation – process_csv() per provider (the process_prompts_* path), and
+  all providers in one pass (generate_responses.py), against simulated
+  backends with a configurable latency distribution, rate-limit (429)
+  injection and response size;
+- merge – merge_csv_files() and its streaming mode on synthetic response
+  files scaled up from generated_prompts.csv;
+- scoring – master_evaluator.evaluate() on the merged synthetic table;
+- startup – import time of every module the generation scripts load at
+  startup, each in a fresh interpreter (`python -X importtime`), against
+  IMPORT_BUDGET_MS. Provider SDKs load on the first request, so importing a
+  process_prompts_* script must not pull them in.
+
+Synthetic tables repeat the prompts of generated_prompts.csv under new
+question ids and reuse the real responses of merged_csv.csv, so scoring sees
+realistic text. Every stage runs in a fresh process, so the reported peak
+memory (max RSS, including the stage's own worker processes) belongs to that
+stage alone.
+
+Save results with --json and compare a later run against them with
+--compare to catch regressions. A module over its import budget fails the
+run like a regression does.
+
+Usage:
+    python benchmark.py --sizes 180 10000 100000 --workers 4
+    python benchmark.py --stages generation --latency 0.2 --distribution lognormal --rate-limit-rate 0.05
+    python benchmark.py --stages startup
+    python benchmark.py --json bench.json
+    python benchmark.py --compare bench.json
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from master_evaluator import evaluate
+from merge_csv_files import merge_csv_files, stream_merge_csv_files
+from prompt_runner import PROMPT_COLUMN_NAME, process_csv
+from providers import FakeProvider, RateLimited
+
+
+PROMPTS_FILE = 'generated_prompts.csv'
+RESPONSES_FILE = 'merged_csv.csv'
+SIMULATED_PROVIDERS = ['claude', 'gemini', 'openai']
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+STAGES = ('generation', 'merge', 'scoring', 'startup')
+
+# Modules the generation scripts import at startup, and the most each may take to import
+STARTUP_MODULES = ['providers', 'prompt_runner', 'batch_runner', 'generate_responses',
+                   'process_prompts_claude', 'process_prompts_gemini', 'process_prompts_openai']
+IMPORT_BUDGET_MS = 150
+
+# Question ids of copy k are original id + k * ID_STRIDE, so keys stay unique
+ID_STRIDE = 1000
+
+# A stage this much slower than in --compare counts as a regression
+REGRESSION_THRESHOLD = 0.2
+
+
+class SimulatedProvider(FakeProvider):
+    """
+    Fake backend standing in for one real provider.
+
+    Latency is drawn from `distribution` around `latency` seconds, and a
+    `rate_limit_rate` share of calls is rejected with a 429 carrying
+    `retry_after`, which exercises the key pool's cooldown and retry path.
+    """
+
+    def __init__(self, name, latency=0.0, distribution='lognormal', rate_limit_rate=0.0, retry_after=0.05,
+                 response_chars=800, concurrency=None, seed=0, **kwargs):
+        self.name = name
+        self.label = f"Simulated {name}"
+        super().__init__(response_chars=response_chars, concurrency=concurrency, **kwargs)
+        self.latency = latency
+        self.distribution = distribution
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(f"{name}:{seed}")
+
+    def delay(self):
+        if self.latency <= 0 or self.distribution == 'constant':
+            return self.latency
+        if self.distribution == 'uniform':
+            return self.rng.uniform(0, 2 * self.latency)
+        if self.distribution == 'exponential':
+            return self.rng.expovariate(1 / self.latency)
+        # Lognormal with a long right tail (sigma 0.75), scaled so its mean is `latency`
+        sigma = 0.75
+        return self.rng.lognormvariate(math.log(self.latency) - sigma ** 2 / 2, sigma)
+
+    def respond(self, prompt):
+        if self.rate_limit_rate and self.rng.random() < self.rate_limit_rate:
+            raise RateLimited("429 Too Many Requests (simulated)", retry_after=self.retry_after)
+        # The parent builds the response text; its own latency is 0 here
+        text, _ = super().respond(prompt)
+        return text, self.delay()
+
+
+def read_csv_rows(path):
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.DictReader(infile)
+        return reader.fieldnames, list(reader)
+
+
+def write_csv_rows(path, fieldnames, rows):
+    with open(path, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def synthetic_prompts(size, prompts_path=PROMPTS_FILE):
+    """
+    `size` prompt rows: the prompts of `prompts_path` repeated under new question
+    ids, each copy's prompt text made unique so deduplication does not collapse them.
+
+    Returns:
+        tuple: (fieldnames, rows)
+    """
+    fieldnames, base = read_csv_rows(prompts_path)
+    rows = []
+    for i in range(size):
+        copy, row = divmod(i, len(base))
+        synthetic = dict(base[row])
+        synthetic['base_question_id'] = str(int(synthetic['base_question_id']) + copy * ID_STRIDE)
+        if copy:
+            synthetic[PROMPT_COLUMN_NAME] = f"{synthetic[PROMPT_COLUMN_NAME]} (variant {copy})"
+        rows.append(synthetic)
+    return fieldnames, rows
+
+
+def write_synthetic_responses(directory, size, prompts_path=PROMPTS_FILE, responses_path=RESPONSES_FILE):
+    """
+    Write one generated_responses_<model>.csv per model with `size` rows,
+    sorted by key (as text) so the streaming merge can read them too.
+
+    Returns:
+        list: Paths of the response files
+    """
+    fieldnames, rows = synthetic_prompts(size, prompts_path)
+    response_fields, responses = read_csv_rows(responses_path)
+    models = [col for col in response_fields if col.endswith('_response')]
+    rows.sort(key=lambda row: (row['base_question_id'], row['assigned_persona'], row['prompt_type']))
+    paths = []
+    for model in models:
+        for i, row in enumerate(rows):
+            row[model] = responses[i % len(responses)][model]
+        path = os.path.join(directory, f"generated_responses_{model[:-len('_response')]}.csv")
+        write_csv_rows(path, fieldnames + [model], rows)
+        paths.append(path)
+    return paths
+
+
+def peak_memory_mb():
+    """Largest resident set of this process and of its finished children, in MB."""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def measured(stage, *args):
+    """Run one stage function with its output silenced; return its result, wall time and peak memory."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = stage(*args)
+    return rows, time.perf_counter() - start, peak_memory_mb()
+
+
+def run_isolated(stage, *args):
+    """Run a stage in a fresh process so its peak memory is its own."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(measured, stage, *args).result()
+
+
+def generate_single(prompts_path, output_path, name, settings):
+    provider = SimulatedProvider(name, **settings)
+    return process_csv(prompts_path, output_path, [provider])
+
+
+def generate_all(prompts_path, output_path, names, settings):
+    providers = [SimulatedProvider(name, **settings) for name in names]
+    return process_csv(prompts_path, output_path, providers)
+
+
+def merge_in_memory(paths, output_path, size):
+    if not merge_csv_files(paths, output_path):
+        raise RuntimeError("in-memory merge failed")
+    return size
+
+
+def merge_streaming(paths, output_path, size):
+    if not stream_merge_csv_files(paths, output_path):
+        raise RuntimeError("streaming merge failed")
+    return size
+
+
+def score(input_path, output_path, workers):
+    rows, _ = evaluate(input_path, output_path, workers=workers, full=True)
+    return rows
+
+
+def import_time_ms(module, repeats=3):
+    """
+    Cumulative import time of `module` in a fresh interpreter, best of `repeats`.
+
+    Returns:
+        float: Milliseconds, as reported by `python -X importtime`
+    """
+    best = math.inf
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, check=True)
+        for line in completed.stderr.splitlines():
+            fields = line.split('|')
+            # Top-level entries are not indented
+            if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+                best = min(best, int(fields[1]) / 1000)
+    return best
+
+
+def run_benchmarks(args, directory):
+    """
+    Returns:
+        list: One dict per benchmark with stage, name, rows, seconds,
+            rows_per_sec and peak_mb
+    """
+    results = []
+
+    def record(stage, name, outcome):
+        rows, seconds, peak = outcome
+        results.append({'stage': stage, 'name': name, 'rows': rows, 'seconds': round(seconds, 3),
+                        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+                        'peak_mb': round(peak, 1)})
+        print(f"  {stage:<11} {name:<28} {rows:>8} rows {seconds:>8.2f}s "
+              f"{results[-1]['rows_per_sec'] or 0:>10.1f} rows/s {peak:>8.1f} MB")
+
+    if 'generation' in args.stages:
+        settings = {'latency': args.latency, 'distribution': args.distribution,
+                    'rate_limit_rate': args.rate_limit_rate, 'retry_after': args.retry_after,
+                    'response_chars': args.response_chars, 'concurrency': args.concurrency}
+        prompts_path = os.path.join(directory, 'prompts.csv')
+        write_csv_rows(prompts_path, *synthetic_prompts(args.generation_rows, args.prompts))
+        for name in SIMULATED_PROVIDERS:
+            record('generation', f"process_prompts {name}",
+                   run_isolated(generate_single, prompts_path, os.path.join(directory, f"gen_{name}.csv"),
+                                name, settings))
+        record('generation', "all providers, one pass",
+               run_isolated(generate_all, prompts_path, os.path.join(directory, 'gen_all.csv'),
+                            SIMULATED_PROVIDERS, settings))
+
+    for size in args.sizes:
+        if not ({'merge', 'scoring'} & set(args.stages)):
+            break
+        size_dir = os.path.join(directory, str(size))
+        os.makedirs(size_dir, exist_ok=True)
+        paths = write_synthetic_responses(size_dir, size, args.prompts, args.responses)
+        merged_path = os.path.join(size_dir, 'merged.csv')
+        if 'merge' in args.stages:
+            record('merge', f"in-memory ({size} rows)", run_isolated(merge_in_memory, paths, merged_path, size))
+            record('merge', f"streaming ({size} rows)",
+                   run_isolated(merge_streaming, paths, os.path.join(size_dir, 'merged_streaming.csv'), size))
+        if 'scoring' in args.stages:
+            if not os.path.exists(merged_path):
+                run_isolated(merge_streaming, paths, merged_path, size)
+            record('scoring', f"full ({size} rows)",
+                   run_isolated(score, merged_path, os.path.join(size_dir, 'scores.csv'), args.workers))
+
+    if 'startup' in args.stages:
+        for module in STARTUP_MODULES:
+            milliseconds = import_time_ms(module)
+            results.append({'stage': 'startup', 'name': f"import {module}", 'import_ms': round(milliseconds, 1),
+                            'budget_ms': IMPORT_BUDGET_MS})
+            flag = '  <-- OVER BUDGET' if milliseconds > IMPORT_BUDGET_MS else ''
+            print(f"  {'startup':<11} {'import ' + module:<28} {milliseconds:>8.1f} ms "
+                  f"(budget {IMPORT_BUDGET_MS} ms){flag}")
+    return results
+
+
+def over_budget(results):
+    """Startup results whose import time exceeds their budget."""
+    return [entry for entry in results if entry.get('import_ms', 0) > entry.get('budget_ms', math.inf)]
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Print the change in rows/sec and peak memory against a saved run.
+
+    Returns:
+        int: Number of benchmarks that got slower than the threshold allows
+    """
+    with open(baseline_path, mode='r', encoding='utf-8') as infile:
+        baseline = {(entry['stage'], entry['name']): entry for entry in json.load(infile)['results']}
+    regressions = 0
+    print(f"\nCompared with '{baseline_path}':")
+    for entry in results:
+        before = baseline.get((entry['stage'], entry['name']))
+        if before and before.get('import_ms') and entry.get('import_ms') is not None:
+            # Import times are checked against their budget rather than the baseline
+            change = entry['import_ms'] / before['import_ms'] - 1
+            print(f"  {entry['stage']:<11} {entry['name']:<28} import {change:+7.1%}")
+            continue
+        if not before or not before.get('rows_per_sec') or not entry.get('rows_per_sec'):
+            continue
+        speed = entry['rows_per_sec'] / before['rows_per_sec'] - 1
+        memory = entry['peak_mb'] / before['peak_mb'] - 1 if before.get('peak_mb') else 0.0
+        flag = ''
+        if speed < -threshold:
+            flag = '  <-- REGRESSION'
+            regressions += 1
+        print(f"  {entry['stage']:<11} {entry['name']:<28} rows/s {speed:+7.1%}  peak memory {memory:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generation, merge and scoring offline.")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help="Stages to run")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[180, 10000],
+                        help="Synthetic row counts for the merge and scoring stages")
+    parser.add_argument('--prompts', default=PROMPTS_FILE, help="Prompts CSV the synthetic data is built from")
+    parser.add_argument('--responses', default=RESPONSES_FILE, help="Merged responses reused as synthetic text")
+    parser.add_argument('--generation-rows', type=int, default=180, help="Prompt rows for the generation stage")
+    parser.add_argument('--latency', type=float, default=0.05, help="Mean simulated latency per call (seconds)")
+    parser.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='lognormal',
+                        help="Simulated latency distribution")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="Share of simulated calls rejected with a 429")
+    parser.add_argument('--retry-after', type=float, default=0.05, help="retry-after sent with simulated 429s")
+    parser.add_argument('--response-chars', type=int, default=800, help="Simulated response length")
+    parser.add_argument('--concurrency', type=int, default=None, help="Requests in flight per provider")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument('--workdir', default=None, help="Where to write synthetic data (default: a temp dir)")
+    parser.add_argument('--keep', action='store_true', help="Keep the synthetic data afterwards")
+    parser.add_argument('--json', default=None, help="Save the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="Compare with results saved by an earlier --json run")
+    args = parser.parse_args()
+
+    directory = args.workdir or tempfile.mkdtemp(prefix='persona_bench_')
+    os.makedirs(directory, exist_ok=True)
+    print(f"Benchmarking {', '.join(args.stages)} (synthetic data in '{directory}')...")
+    try:
+        results = run_benchmarks(args, directory)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, mode='w', encoding='utf-8') as outfile:
+            json.dump({'settings': {key: value for key, value in vars(args).items()
+                                    if key not in ('json', 'compare')},
+                       'results': results}, outfile, indent=2)
+        print(f"\n✓ Results saved to '{args.json}'.")
+    failed = False
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"\n{regressions} benchmark(s) regressed by more than {REGRESSION_THRESHOLD:.0%}.")
+            failed = True
+    slow_imports = over_budget(results)
+    if slow_imports:
+        print(f"\n{len(slow_imports)} module(s) over the {IMPORT_BUDGET_MS} ms import budget: "
+              f"{', '.join(entry['name'][len('import '):] for entry in slow_imports)}.")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Response Generator
+
+Single pass over the prompts CSV that fans every prompt out to all selected
+providers at once and writes one CSV with a response column per provider
+(`claude_response`, `gemini_response`, `openai_response`, ...). This replaces
+running the three process_prompts_* scripts one after the other and then
+merging their outputs.
+
+Examples:
+
+    python generate_responses.py --providers claude gemini openai
+    python generate_responses.py --providers fake --latency 0.5 --concurrency fake=16
+    python generate_responses.py --providers claude openai --batch
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+from batch_runner import DEFAULT_MAX_BATCH_SIZE, DEFAULT_POLL_INTERVAL, IncompleteBatchError, process_csv_batch
+from prompt_grid import parse_cells, parse_shard, resolve_cells
+from prompt_runner import DEFAULT_SAMPLES, PROMPT_COLUMN_NAME, process_csv
+from providers import PROVIDERS, FakeProvider, get_provider
+from request_metrics import METRICS_SUFFIX, MetricsLog
+from response_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ResponseCache
+
+
+INPUT_CSV_FILE = 'generated_prompts.csv'
+OUTPUT_CSV_FILE = 'generated_responses.csv'
+
+
+def parse_concurrency(values):
+    """
+    Parse NAME=N overrides into a dict.
+
+    Args:
+        values (list): Strings like 'claude=8'
+
+    Returns:
+        dict: Provider name -> concurrency
+    """
+    limits = {}
+    for value in values or []:
+        name, _, number = value.partition('=')
+        if name not in PROVIDERS or not number.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid concurrency '{value}'; expected NAME=N.")
+        limits[name] = int(number)
+    return limits
+
+
+def build_providers(names, concurrency=None, latency=0.0, jitter=0.0, response_chars=800, **output):
+    """
+    Create the adapters for the requested provider names.
+
+    Args:
+        names (list): Provider names (see providers.PROVIDERS)
+        concurrency (dict): Optional per-provider concurrency overrides
+        latency, jitter, response_chars: Settings for the fake provider
+        **output: stream / max_output_bytes / max_output_tokens / pool_size for every adapter
+
+    Returns:
+        list: Provider adapters in the requested order
+    """
+    concurrency = concurrency or {}
+    providers = []
+    for name in names:
+        if name == FakeProvider.name:
+            providers.append(FakeProvider(latency=latency, jitter=jitter, response_chars=response_chars,
+                                          concurrency=concurrency.get(name), **output))
+        else:
+            providers.append(get_provider(name, concurrency=concurrency.get(name), **output))
+    return providers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate model responses for every prompt in one pass.")
+    parser.add_argument('--input', default=INPUT_CSV_FILE, help="Prompts CSV or prompt grid spec (.json) to read")
+    rows_group = parser.add_mutually_exclusive_group()
+    rows_group.add_argument('--cells', type=parse_cells, default=None, metavar='START:STOP',
+                            help="Only process this range of input rows / grid cells")
+    rows_group.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                            help="Only process shard I of N equal contiguous row ranges")
+    parser.add_argument('--output', default=OUTPUT_CSV_FILE, help="CSV to write responses to")
+    parser.add_argument('--providers', nargs='+', default=['claude', 'gemini', 'openai'],
+                        choices=sorted(PROVIDERS), help="Providers to query for every prompt")
+    parser.add_argument('--prompt-column', default=PROMPT_COLUMN_NAME, help="Column holding the prompt")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reuse good responses from a previous output; only request missing or failed rows")
+    parser.add_argument('--batch', action='store_true',
+                        help="Submit the prompts as provider batch jobs instead of live requests")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between batch status checks")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Maximum requests per batch job")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the response cache")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help="SQLite response cache file")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="Evict least recently used responses beyond this size")
+    parser.add_argument('--concurrency', nargs='*', metavar='NAME=N',
+                        help="Requests in flight per provider (default: $<NAME>_CONCURRENCY or 4)")
+    parser.add_argument('--metrics', default=None,
+                        help=f"Per-request metrics JSONL (default: <output>{METRICS_SUFFIX})")
+    parser.add_argument('--no-metrics', action='store_true', help="Do not record per-request metrics")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help="Requests per unique prompt; rows sharing a prompt reuse its responses")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Send one request per row, even for repeated prompts")
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help="Kept-alive HTTP connections per API key (default: {NAME}_POOL_SIZE or the concurrency)")
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help="Stream responses (records time to first token; default: {NAME}_STREAM)")
+    parser.add_argument('--max-output-bytes', type=int, default=None,
+                        help="Cut responses off at this many UTF-8 bytes (default: {NAME}_MAX_OUTPUT_BYTES)")
+    parser.add_argument('--max-output-tokens', type=int, default=None,
+                        help="Cap completions on the API side (default: {NAME}_MAX_OUTPUT_TOKENS)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean latency of the fake provider")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Latency jitter of the fake provider")
+    parser.add_argument('--response-chars', type=int, default=800, help="Response length of the fake provider")
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("--samples must be at least 1")
+    samples = None if args.no_dedup else args.samples
+
+    load_dotenv()
+    try:
+        providers = build_providers(args.providers, parse_concurrency(args.concurrency),
+                                    latency=args.latency, jitter=args.jitter,
+                                    response_chars=args.response_chars, stream=args.stream,
+                                    max_output_bytes=args.max_output_bytes,
+                                    max_output_tokens=args.max_output_tokens, pool_size=args.pool_size)
+    except (ValueError, ImportError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    print(f"Starting to process prompts from '{args.input}' with "
+          f"{', '.join(f'{p.label} ({p.concurrency} in flight)' for p in providers)}...")
+    cache = None if args.no_cache else ResponseCache(args.cache_path, int(args.cache_max_mb * 1024 * 1024))
+    # Batch jobs have no per-request timings to record
+    metrics = None if args.no_metrics or args.batch else MetricsLog(args.metrics or args.output + METRICS_SUFFIX)
+    start = time.perf_counter()
+    try:
+        cells = resolve_cells(args.input, args.cells, args.shard)
+        if args.batch:
+            count = process_csv_batch(args.input, args.output, providers, prompt_column=args.prompt_column,
+                                      resume=args.resume, cache=cache, max_batch_size=args.max_batch_size,
+                                      poll_interval=args.poll_interval, samples=samples, cells=cells)
+        else:
+            count = process_csv(args.input, args.output, providers, prompt_column=args.prompt_column,
+                                resume=args.resume, cache=cache, metrics=metrics, samples=samples,
+                                cells=cells)
+        elapsed = time.perf_counter() - start
+        print(f"\nProcessing complete. {count} rows in {elapsed:.2f}s ({count / elapsed:.1f} rows/sec) "
+              f"saved to '{args.output}'.")
+    except FileNotFoundError:
+        print(f"Error: The file '{args.input}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except IncompleteBatchError as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    finally:
+        if metrics is not None:
+            print(metrics.summary())
+            metrics.close()
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+        for provider in providers:
+            provider.close()
+
+
+if __name__ == "__main__":
+    main()
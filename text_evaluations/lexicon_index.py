@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Compiled Lexicon Index
+
+Turns a word-norm lexicon CSV (concreteness ratings, TAALES norms, ...) into a
+single `.lex.npy` file: a structured NumPy array of 64-bit word hashes, sorted,
+next to the norm values of each word. Loading it is a memory map rather than
+parsing and hashing tens of thousands of CSV rows, and because the file is
+mapped read-only, every scoring worker process shares the same pages.
+
+Lookups are vectorized: the hashes of a whole token array are matched with one
+np.searchsorted call.
+
+Usage:
+    python lexicon_index.py lexicons/concreteness.csv --columns rating
+    python lexicon_index.py lexicons/taales.csv --columns ease academic
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+
+COMPILED_SUFFIX = '.lex.npy'
+KEY_FIELD = 'key'
+
+
+@lru_cache(maxsize=1 << 18)
+def hash_word(word):
+    """Stable 64-bit hash of a lowercase word (the same in every process and run)."""
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def hash_words(words):
+    """Hash a sequence of words into a uint64 array."""
+    return np.fromiter((hash_word(word) for word in words), dtype=np.uint64, count=len(words))
+
+
+def compiled_path(csv_path):
+    """Path of the compiled index that belongs to a lexicon CSV."""
+    return os.path.splitext(csv_path)[0] + COMPILED_SUFFIX
+
+
+def compile_lexicon(csv_path, value_columns, output_path=None):
+    """
+    Compile a lexicon CSV with a `word` column into a sorted hash index.
+
+    Args:
+        csv_path (str): Lexicon CSV
+        value_columns (list): Numeric columns to keep, in order
+        output_path (str): Where to write the index (default: next to the CSV)
+
+    Returns:
+        str: Path of the compiled index
+
+    Raises:
+        ValueError: If two different words hash to the same key
+    """
+    output_path = output_path or compiled_path(csv_path)
+    entries = {}
+    with open(csv_path, mode='r', encoding='utf-8', newline='') as infile:
+        for row in csv.DictReader(infile):
+            try:
+                word = row['word'].strip().lower()
+                values = tuple(float(row[col]) for col in value_columns)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            if word and word not in entries:
+                entries[word] = values
+
+    dtype = np.dtype([(KEY_FIELD, '<u8')] + [(col, '<f8') for col in value_columns])
+    table = np.empty(len(entries), dtype=dtype)
+    table[KEY_FIELD] = hash_words(list(entries))
+    for i, col in enumerate(value_columns):
+        table[col] = [values[i] for values in entries.values()]
+    table.sort(order=KEY_FIELD)
+    if len(table) > 1 and (np.diff(table[KEY_FIELD]) == 0).any():
+        raise ValueError(f"Hash collision while compiling '{csv_path}'.")
+
+    tmp_path = output_path + '.tmp.npy'
+    np.save(tmp_path, table)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class CompiledLexicon:
+    """
+    Read-only, memory-mapped view of a compiled lexicon.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.table = np.load(path, mmap_mode='r')
+        self.keys = self.table[KEY_FIELD]
+        self.columns = [name for name in self.table.dtype.names if name != KEY_FIELD]
+
+    def __len__(self):
+        return len(self.table)
+
+    def lookup(self, hashes):
+        """
+        Match word hashes against the lexicon.
+
+        Args:
+            hashes (ndarray): uint64 word hashes (see hash_words)
+
+        Returns:
+            tuple: (boolean mask of words found, float array of shape
+                (found words, value columns))
+        """
+        if len(self.keys) == 0 or len(hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool), np.empty((0, len(self.columns)))
+        positions = np.searchsorted(self.keys, hashes)
+        positions[positions == len(self.keys)] = 0
+        found = self.keys[positions] == hashes
+        rows = self.table[positions[found]]
+        values = np.column_stack([rows[col] for col in self.columns]) if len(rows) else \
+            np.empty((0, len(self.columns)))
+        return found, values
+
+
+def load_compiled_lexicon(path, value_columns):
+    """
+    Open a lexicon, compiling its CSV first if the index is missing or stale.
+
+    Args:
+        path (str): Lexicon CSV or compiled `.lex.npy` file
+        value_columns (list): Numeric columns the index must contain
+
+    Returns:
+        CompiledLexicon: or None if the file does not exist
+    """
+    if not path or not os.path.exists(path):
+        return None
+    if path.endswith(COMPILED_SUFFIX):
+        return CompiledLexicon(path)
+    index_path = compiled_path(path)
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+        compile_lexicon(path, value_columns, index_path)
+    lexicon = CompiledLexicon(index_path)
+    if lexicon.columns != list(value_columns):
+        compile_lexicon(path, value_columns, index_path)
+        lexicon = CompiledLexicon(index_path)
+    return lexicon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a word-norm lexicon CSV into a memory-mapped index.")
+    parser.add_argument('lexicon', help="Lexicon CSV with a 'word' column")
+    parser.add_argument('--columns', nargs='+', required=True, help="Numeric columns to keep")
+    parser.add_argument('-o', '--output', default=None, help=f"Output path (default: <lexicon>{COMPILED_SUFFIX})")
+    args = parser.parse_args()
+
+    output_path = compile_lexicon(args.lexicon, args.columns, args.output)
+    print(f"✓ Compiled {len(CompiledLexicon(output_path))} words into '{output_path}'.")
+
+
+if __name__ == "__main__":
+    main()
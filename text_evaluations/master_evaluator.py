@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Master Evaluator
+
+Scores `merged_csv.csv` in a single pass: every `<model>_response` column
+is scored with every metric and the results are appended as
+`<model>_<metric>` columns, in the same layout as the existing
+`master_scores.csv`. The output defaults to `computed_scores.csv`; the
+committed master table is only replaced when it is named explicitly.
+
+Responses are scored a column chunk at a time: the chunk is tokenized once
+into flat word arrays shared by all metrics, and word, sentence, syllable and
+connective counts come out of NumPy kernels (see text_kernels.py). Chunks are
+scored in a process pool, so scoring time scales with the number of cores
+rather than with the number of metrics. The lexicons are
+compiled once into memory-mapped hash indexes (see lexicon_index.py) that all
+workers share and that are matched against a whole response in one
+vectorized lookup.
+
+Scoring is incremental: `<output>.state.sqlite` records the fingerprint of
+every response and the version of every metric it was scored with, and a
+rerun only computes the (row, model, metric) cells that are missing or out of
+date, patching them into the existing output. Use --full to rescore everything.
+
+Metrics (columns per model):
+
+- taaco_connectives – connective phrases (TAACO "all connectives") per word
+- readability_flesch – Flesch reading ease,
+  206.835 - 1.015 × words/sentences - 84.6 × syllables/words
+- concreteness_average / _share_concrete / _coverage – mean concreteness
+  rating of the words found in the concreteness lexicon (Brysbaert et al.
+  norms, 1–5), share of those words rated ≥ 4, and share of words found
+- taales_composite / _ease / _coverage / _academic – mean ease and academic
+  scores (both scaled 0–1) of the words found in the TAALES word-norm
+  lexicon, their mean, and share of words found
+
+The two lexicons are not shipped with the repository; pass them with
+--concreteness-lexicon (CSV with word, rating columns) and --taales-lexicon
+(CSV with word, ease, academic columns), or their compiled `.lex.npy`
+indexes. When a lexicon is not available its metrics are not computed:
+their values are kept from the previous output (unless the response changed
+since) and left empty for new rows.
+
+Usage:
+    python master_evaluator.py merged_csv.csv computed_scores.csv --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from lexicon_index import load_compiled_lexicon
+from table_io import RESPONSE_SUFFIX, read_table, write_table
+from text_kernels import (ColumnTokens, connective_counts, sentence_counts, syllable_counts,
+                          word_counts)
+
+
+INPUT_FILE = 'merged_csv.csv'
+# Scores written by default; the committed master_scores.csv is only replaced on request
+OUTPUT_FILE = 'computed_scores.csv'
+CONCRETENESS_LEXICON = os.path.join('lexicons', 'concreteness.csv')
+TAALES_LEXICON = os.path.join('lexicons', 'taales.csv')
+
+# Sidecar file recording which response / metric version every score cell came from
+STATE_SUFFIX = '.state.sqlite'
+
+# Columns that identify a row across runs
+KEY_COLUMNS = ['base_question_id', 'assigned_persona', 'prompt_type']
+
+# Concreteness rating at or above which a word counts as concrete
+CONCRETE_THRESHOLD = 4.0
+
+
+def ratio(numerator, denominator):
+    """Element-wise numerator / denominator, NaN where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(numerator.shape, math.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def round4(values):
+    """Round like Python's round(x, 4), element-wise."""
+    return np.array([round(value, 4) for value in values.tolist()], dtype=float)
+
+
+def connectives(tokens, lexicons):
+    return [ratio(connective_counts(tokens), word_counts(tokens))]
+
+
+def flesch(tokens, lexicons):
+    words = word_counts(tokens)
+    return [206.835 - 1.015 * (words / sentence_counts(tokens))
+            - 84.6 * ratio(syllable_counts(tokens), words)]
+
+
+def lexicon_matches(tokens, lexicon):
+    """Rows of the words found in a compiled lexicon, and their norm values."""
+    found, values = lexicon.lookup(tokens.hashes)
+    return tokens.rows[found], values
+
+
+def concreteness(tokens, lexicons):
+    lexicon = lexicons.get('concreteness')
+    if lexicon is None:
+        return [np.full(tokens.size, math.nan)] * 3
+    rows, values = lexicon_matches(tokens, lexicon)
+    found = np.bincount(rows, minlength=tokens.size)
+    ratings = values[:, 0]
+    return [
+        round4(ratio(np.bincount(rows, weights=ratings, minlength=tokens.size), found)),
+        round4(ratio(np.bincount(rows[ratings >= CONCRETE_THRESHOLD], minlength=tokens.size), found)),
+        round4(ratio(found, word_counts(tokens))),
+    ]
+
+
+def taales(tokens, lexicons):
+    lexicon = lexicons.get('taales')
+    if lexicon is None:
+        return [np.full(tokens.size, math.nan)] * 4
+    rows, values = lexicon_matches(tokens, lexicon)
+    found = np.bincount(rows, minlength=tokens.size)
+    ease = ratio(np.bincount(rows, weights=values[:, 0], minlength=tokens.size), found)
+    academic = ratio(np.bincount(rows, weights=values[:, 1], minlength=tokens.size), found)
+    return [
+        round4((ease + academic) / 2),
+        round4(ease),
+        round4(ratio(found, word_counts(tokens))),
+        round4(academic),
+    ]
+
+
+# (metric family, column suffixes, function(tokens, lexicons) -> one array per suffix, version)
+# Every function scores a whole column of responses (text_kernels.ColumnTokens) at once.
+# Bump a metric's version when its formula changes so incremental runs rescore it.
+METRICS = [
+    ('taaco', ['connectives'], connectives, 1),
+    ('readability', ['flesch'], flesch, 1),
+    ('concreteness', ['average', 'share_concrete', 'coverage'], concreteness, 3),
+    ('taales', ['composite', 'ease', 'coverage', 'academic'], taales, 3),
+]
+METRIC_FIELDS = {family: fields for family, fields, _, _ in METRICS}
+
+# Lexicon each family depends on; changing the lexicon file also invalidates its scores
+METRIC_LEXICONS = {'concreteness': 'concreteness', 'taales': 'taales'}
+
+
+def load_lexicon(path, value_columns, warn=True):
+    """
+    Open a word-norm lexicon as a memory-mapped CompiledLexicon, compiling
+    the CSV into its `.lex.npy` index first if needed.
+
+    Returns None (with a warning) if the file does not exist.
+    """
+    lexicon = load_compiled_lexicon(path, value_columns)
+    if lexicon is None and warn:
+        print(f"Warning: lexicon '{path}' not found; its metrics are kept from the previous output "
+              f"or left empty.")
+    return lexicon
+
+
+def load_lexicons(concreteness_path, taales_path, warn=True):
+    return {
+        'concreteness': load_lexicon(concreteness_path, ['rating'], warn),
+        'taales': load_lexicon(taales_path, ['ease', 'academic'], warn),
+    }
+
+
+# Lexicons of the current worker process, mapped once by init_worker()
+WORKER_LEXICONS = {}
+
+
+def init_worker(concreteness_path, taales_path):
+    global WORKER_LEXICONS
+    WORKER_LEXICONS = load_lexicons(concreteness_path, taales_path, warn=False)
+
+
+def score_texts(texts, lexicons, families=None):
+    """
+    Score a column of responses with every metric, or only the given metric families.
+
+    Args:
+        texts (list): Responses
+        lexicons (dict): Compiled lexicons from load_lexicons()
+        families (iterable): Metric families to compute, or None for all
+
+    Returns:
+        ndarray: One row per response, metric values in METRICS order for the
+            selected families (NaN for empty or error responses)
+    """
+    selected = [metric for metric in METRICS if families is None or metric[0] in families]
+    tokens = ColumnTokens(texts)
+    columns = []
+    for _, _, metric, _ in selected:
+        columns.extend(metric(tokens, lexicons))
+    values = np.column_stack(columns) if columns else np.empty((tokens.size, 0))
+    values[~tokens.valid] = math.nan
+    return values
+
+
+def score_text(text, lexicons, families=None):
+    """Score one response; see score_texts()."""
+    return score_texts([text], lexicons, families)[0].tolist()
+
+
+def score_chunk(texts, families):
+    """Worker entry point: score a chunk of responses with the worker's lexicons."""
+    return score_texts(texts, WORKER_LEXICONS, families)
+
+
+def score_rows(df):
+    """
+    Worker entry point: score every response of a (small) table with the
+    worker's lexicons, without any incremental bookkeeping.
+
+    Returns:
+        DataFrame: `df` followed by the metric columns in master_scores order
+    """
+    models = response_models(df.columns)
+    scores = {}
+    for model in models:
+        values = score_texts(df[f"{model}_response"].tolist(), WORKER_LEXICONS)
+        names = [f"{model}_{family}_{field}" for family, fields, _, _ in METRICS for field in fields]
+        scores.update(zip(names, values.T))
+    metrics = pd.DataFrame({name: scores[name] for name in metric_column_names(models)}, index=df.index)
+    return pd.concat([df, metrics], axis=1)
+
+
+def metric_column_names(models):
+    """Output columns in master_scores order: family, then model, then field."""
+    return [f"{model}_{family}_{field}"
+            for family, fields, _, _ in METRICS
+            for model in models
+            for field in fields]
+
+
+def response_models(columns):
+    """Model names from the `<model>_response` columns, in column order."""
+    return [col[:-len(RESPONSE_SUFFIX)] for col in columns if col.endswith(RESPONSE_SUFFIX)]
+
+
+def fingerprint(text):
+    """Content hash of a response; NaN / missing responses hash like the empty string."""
+    return hashlib.sha256((text if isinstance(text, str) else '').encode('utf-8')).hexdigest()
+
+
+def file_digest(path):
+    """Short content hash of a lexicon file, or 'none' if it is missing."""
+    if not path or not os.path.exists(path):
+        return 'none'
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def metric_versions(concreteness_path, taales_path):
+    """Version string per metric family: formula version plus the lexicon it reads."""
+    lexicon_digests = {'concreteness': file_digest(concreteness_path), 'taales': file_digest(taales_path)}
+    versions = {}
+    for family, _, _, version in METRICS:
+        lexicon = METRIC_LEXICONS.get(family)
+        versions[family] = f"{version}:{lexicon_digests[lexicon]}" if lexicon else str(version)
+    return versions
+
+
+def row_keys(df):
+    """Composite key of every row as a string, or None if the key columns are missing."""
+    if not all(col in df.columns for col in KEY_COLUMNS):
+        return None
+    return [json.dumps(values) for values in df[KEY_COLUMNS].astype(str).values.tolist()]
+
+
+class ScoreState:
+    """
+    Sidecar SQLite file recording, for every (row, model, metric family) cell of
+    the score table, the fingerprint of the response and the metric version it
+    was computed with.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS cells ('
+            ' row_key TEXT NOT NULL,'
+            ' model TEXT NOT NULL,'
+            ' family TEXT NOT NULL,'
+            ' fingerprint TEXT NOT NULL,'
+            ' version TEXT NOT NULL,'
+            ' PRIMARY KEY (row_key, model, family))'
+        )
+        self.connection.commit()
+
+    def load(self):
+        """
+        Returns:
+            dict: (row_key, model, family) -> (fingerprint, version)
+        """
+        return {
+            (row_key, model, family): (fp, version)
+            for row_key, model, family, fp, version in self.connection.execute('SELECT * FROM cells')
+        }
+
+    def update(self, cells):
+        """Record (row_key, model, family, fingerprint, version) tuples."""
+        self.connection.executemany('INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?)', cells)
+        self.connection.commit()
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cells')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def score_table(df, workers=None, concreteness_path=CONCRETENESS_LEXICON, taales_path=TAALES_LEXICON,
+                chunk_size=1024, previous=None, known=None):
+    """
+    Add every metric column for every model to a merged responses table.
+
+    With `previous` (an earlier score table) and `known` (ScoreState.load()),
+    only the (row, model, metric) cells whose response fingerprint or metric
+    version changed, or that are missing, are computed; every other cell is
+    copied from `previous` by composite key.
+
+    Metric families whose lexicon is missing are never computed: their cells
+    are copied from `previous` (even without `known`) unless its response, or
+    the one recorded in `known`, differs; they are NaN otherwise.
+
+    Args:
+        df (DataFrame): Merged responses with `<model>_response` columns
+        workers (int): Worker processes (default: CPU count); 1 scores in-process
+        concreteness_path (str): Concreteness lexicon CSV or compiled index
+        taales_path (str): TAALES lexicon CSV or compiled index
+        chunk_size (int): Responses sent to a worker at a time
+        previous (DataFrame): Earlier score table to reuse cells from
+        known (dict): Cell fingerprints / versions of `previous`
+
+    Returns:
+        tuple: (score table, list of computed (row_key, model, family,
+            fingerprint, version) cells)
+    """
+    models = response_models(df.columns)
+    versions = metric_versions(concreteness_path, taales_path)
+    keys = row_keys(df)
+    result = df.copy()
+    for name in metric_column_names(models):
+        result[name] = math.nan
+
+    # Compile any stale index here, so the workers only ever map finished files
+    WORKER_LEXICONS.update(load_lexicons(concreteness_path, taales_path))
+    unavailable = {family for family, lexicon in METRIC_LEXICONS.items() if WORKER_LEXICONS.get(lexicon) is None}
+
+    previous_keys = row_keys(previous) if keys is not None and previous is not None else None
+    reusable = bool(previous_keys is not None and known)
+    if previous_keys is not None:
+        # Align the previous table to the current rows by key in one vectorized step
+        aligned = previous.set_axis(previous_keys, axis=0)
+        aligned = aligned[~aligned.index.duplicated(keep='first')].reindex(keys)
+        for name in metric_column_names(models):
+            if name in aligned.columns:
+                result[name] = aligned[name].to_numpy()
+        previous_key_set = set(previous_keys)
+        previous_texts = {model: aligned[f"{model}_response"].tolist() for model in models
+                          if f"{model}_response" in aligned.columns}
+
+    # Decide, cell by cell, what can be kept and what must be computed
+    work = []
+    stale = {}
+    for model in models:
+        texts = previous_texts.get(model) if previous_keys is not None else None
+        for row, text in enumerate(df[f"{model}_response"].tolist()):
+            fp = fingerprint(text)
+            families = []
+            for family, fields, _, _ in METRICS:
+                if family in unavailable:
+                    # Cannot be rescored; a kept value is dropped if it belongs to another response
+                    cell = known.get((keys[row], model, family)) if known else None
+                    if (cell is not None and cell[0] != fp) or (texts is not None and fingerprint(texts[row]) != fp):
+                        stale.setdefault(family, []).append((row, model))
+                elif not (reusable and keys[row] in previous_key_set
+                        and all(f"{model}_{family}_{field}" in previous.columns for field in fields)
+                        and known.get((keys[row], model, family)) == (fp, versions[family])):
+                    families.append(family)
+            if families:
+                work.append((row, model, text, fp, families))
+
+    # Chunks of responses that need the same metric families, scored column-wise
+    groups = {}
+    for item in work:
+        groups.setdefault(tuple(item[4]), []).append(item)
+    work, chunks = [], []
+    for families, items in groups.items():
+        for start in range(0, len(items), chunk_size):
+            work.extend(items[start:start + chunk_size])
+            chunks.append(([text for _, _, text, _, _ in items[start:start + chunk_size]], families))
+    workers = min(workers or os.cpu_count() or 1, max(1, len(chunks)))
+    if workers == 1:
+        scored = [score_chunk(texts, families) for texts, families in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(concreteness_path, taales_path)) as executor:
+            scored = list(executor.map(score_chunk, *zip(*chunks))) if chunks else []
+    values = [row for chunk in scored for row in chunk.tolist()]
+
+    computed = []
+    updates = {name: ([], []) for name in metric_column_names(models)}
+    for family, cells in stale.items():
+        for row, model in cells:
+            for field in METRIC_FIELDS[family]:
+                rows, column_values = updates[f"{model}_{family}_{field}"]
+                rows.append(row)
+                column_values.append(math.nan)
+    for (row, model, _, fp, families), row_values in zip(work, values):
+        offset = 0
+        for family in families:
+            fields = METRIC_FIELDS[family]
+            for field_index, field in enumerate(fields):
+                rows, column_values = updates[f"{model}_{family}_{field}"]
+                rows.append(row)
+                column_values.append(row_values[offset + field_index])
+            offset += len(fields)
+            if keys is not None:
+                computed.append((keys[row], model, family, fp, versions[family]))
+    # Write the computed cells back one column at a time
+    for name, (rows, column_values) in updates.items():
+        if rows:
+            column = result[name].to_numpy(dtype=float, copy=True)
+            column[rows] = column_values
+            result[name] = column
+    return result, computed
+
+
+def evaluate(input_path, output_path, workers=None, concreteness_path=CONCRETENESS_LEXICON,
+             taales_path=TAALES_LEXICON, full=False):
+    """
+    Score `input_path` into `output_path`, reusing unchanged cells of an existing output.
+
+    Args:
+        input_path (str): Merged responses table
+        output_path (str): Score table to write (and to reuse cells from)
+        workers (int): Worker processes
+        concreteness_path, taales_path (str): Lexicon CSVs
+        full (bool): Ignore the previous output and rescore every cell
+
+    Returns:
+        tuple: (row count, number of (row, model, metric) cells computed)
+    """
+    df = read_table(input_path)
+    state = ScoreState(output_path + STATE_SUFFIX)
+    try:
+        previous, known = None, {}
+        if full:
+            state.clear()
+        else:
+            known = state.load()
+        if os.path.exists(output_path):
+            # Also read on --full: families without a lexicon keep their previous values
+            previous = read_table(output_path)
+        scored, computed = score_table(df, workers=workers, concreteness_path=concreteness_path,
+                                       taales_path=taales_path, previous=previous, known=known)
+        write_table(scored, output_path)
+        state.update(computed)
+    finally:
+        state.close()
+    return len(scored), len(computed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every model response with every metric.")
+    parser.add_argument('input', nargs='?', default=INPUT_FILE, help="Merged responses table")
+    parser.add_argument('output', nargs='?', default=OUTPUT_FILE, help="Score table to write (.csv or .parquet)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--concreteness-lexicon', default=CONCRETENESS_LEXICON,
+                        help="CSV with word, rating columns (or its compiled .lex.npy)")
+    parser.add_argument('--taales-lexicon', default=TAALES_LEXICON,
+                        help="CSV with word, ease, academic columns (or its compiled .lex.npy)")
+    parser.add_argument('--full', action='store_true',
+                        help="Rescore every cell instead of only changed responses / metrics")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print(f"Scoring '{args.input}' into '{args.output}'...")
+    rows, computed = evaluate(args.input, args.output, workers=args.workers,
+                              concreteness_path=args.concreteness_lexicon,
+                              taales_path=args.taales_lexicon, full=args.full)
+    print(f"✓ {rows} rows; computed {computed} (row, model, metric) cells, reused the rest, "
+          f"in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
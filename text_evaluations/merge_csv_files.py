@@ -14,14 +14,42 @@ Common columns expected:
 - generated_prompt
 
 Each file will have one additional unique column.
-The script will merge all files based on base_question_id to create a comprehensive dataset.
+The script will merge all files on the composite key
+(base_question_id, assigned_persona, prompt_type) to create a comprehensive dataset;
+base_question_id alone repeats once per prompt_type.
+
+Usage:
+    python merge_csv_files.py generated_responses_*.csv -o merged_csv.csv
+    python merge_csv_files.py 'shards/*.csv' -o merged_csv.csv --streaming
+
+--streaming merges inputs that are already sorted by the key (compared as text)
+row by row, so memory stays flat no matter how large the inputs are. Run
+without arguments for the interactive prompts.
+
+Inputs and output may also be Parquet/Arrow tables (see table_io.py), e.g.
+`-o merged_csv.parquet`.
 """
 
+import argparse
+import csv
+import glob
 import pandas as pd
 import os
 import sys
 from pathlib import Path
 
+from table_io import TABLE_SUFFIXES, read_table, write_table
+
+
+# Columns shared by every response file
+EXPECTED_COMMON_COLS = [
+    'base_question_id', 'category', 'base_question',
+    'assigned_persona', 'prompt_type', 'generated_prompt'
+]
+
+# Columns that together identify one prompt row
+MERGE_KEY = ['base_question_id', 'assigned_persona', 'prompt_type']
+
 
 def get_csv_files():
     """
@@ -54,9 +82,10 @@ def get_csv_files():
             print(f"Error: File '{file_path}' does not exist. Please check the path and try again.")
             continue
             
-        # Check if it's a CSV file
-        if not file_path.lower().endswith('.csv'):
-            print(f"Error: '{file_path}' is not a CSV file. Please provide a .csv file.")
+        # Check if it's a CSV (or Parquet/Arrow) file
+        if not file_path.lower().endswith(TABLE_SUFFIXES):
+            print(f"Error: '{file_path}' is not a CSV file. Please provide a .csv file "
+                  f"(or {', '.join(TABLE_SUFFIXES[1:])}).")
             continue
             
         csv_files.append(file_path)
@@ -76,20 +105,14 @@ def analyze_csv_structure(file_path):
         tuple: (dataframe, common_columns, unique_columns)
     """
     try:
-        # Read the CSV file
-        df = pd.read_csv(file_path)
-        
-        # Define expected common columns
-        expected_common_cols = [
-            'base_question_id', 'category', 'base_question', 
-            'assigned_persona', 'prompt_type', 'generated_prompt'
-        ]
+        # Read the CSV (or Parquet/Arrow) file
+        df = read_table(file_path)
         
         # Find which expected columns are present
-        present_common_cols = [col for col in expected_common_cols if col in df.columns]
+        present_common_cols = [col for col in EXPECTED_COMMON_COLS if col in df.columns]
         
         # Find unique columns (columns not in the expected common set)
-        unique_cols = [col for col in df.columns if col not in expected_common_cols]
+        unique_cols = [col for col in df.columns if col not in EXPECTED_COMMON_COLS]
         
         return df, present_common_cols, unique_cols
         
@@ -98,13 +121,95 @@ def analyze_csv_structure(file_path):
         return None, [], []
 
 
-def merge_csv_files(csv_files, output_path):
+def merge_frames(file_data, merge_key):
+    """
+    Join every file's unique columns onto the common columns in a single pass.
+
+    Each frame is indexed on the merge key and all of them are aligned with one
+    pd.concat(axis=1), so the cost is linear in the total number of rows instead
+    of re-merging (and copying) a growing frame once per file. Duplicate keys
+    within a file are reported and only their first row is kept; keys missing
+    from some files are reported and left empty in those files' columns.
+
+    A column found in several files (e.g. claude_response in two shards of
+    the same run) is combined across them: each key takes the first non-empty
+    value, and keys whose files hold different values are reported.
+
+    Args:
+        file_data (list): Dicts with 'path', 'df', 'common_cols', 'unique_cols'
+        merge_key (list): Key columns, or None to align files by row position
+
+    Returns:
+        DataFrame: Merged data, or None if the files cannot be aligned
+    """
+    common_parts = []
+    # Unique column -> [(file name, column)] in file order
+    unique_parts = {}
+    file_keys = []
+
+    for item in file_data:
+        df = item['df']
+        name = Path(item['path']).name
+        if not item['unique_cols']:
+            print(f"  Warning: No unique columns found in {item['path']}")
+
+        if merge_key:
+            duplicated = df.duplicated(subset=merge_key, keep='first')
+            if duplicated.any():
+                print(f"  Warning: {int(duplicated.sum())} duplicate key(s) in {name}; keeping the first row of each:")
+                print(df.loc[duplicated, merge_key].head(10).to_string(index=False))
+                df = df.loc[~duplicated]
+            df = df.set_index(merge_key)
+        elif len(df) != len(file_data[0]['df']):
+            print(f"  Error: Row count mismatch for {item['path']}; cannot align by row index.")
+            return None
+
+        common_parts.append(df[[col for col in item['common_cols'] if col not in (merge_key or [])]])
+        for col in item['unique_cols']:
+            unique_parts.setdefault(col, []).append((name, df[col]))
+        file_keys.append((name, df.index))
+
+    if merge_key:
+        # Shared metadata: each key keeps the common columns of the first file that has it, as --streaming does
+        common = pd.concat(common_parts)
+        common = common[~common.index.duplicated(keep='first')]
+        all_keys = common.index
+        for name, keys in file_keys:
+            missing = all_keys.difference(keys)
+            if len(missing):
+                print(f"  Warning: {len(missing)} key(s) missing from {name}; their columns are left empty.")
+    else:
+        common = common_parts[0]
+
+    columns = []
+    for col, parts in unique_parts.items():
+        combined = parts[0][1]
+        for name, part in parts[1:]:
+            shared = combined.index.intersection(part.index)
+            earlier, later = combined.reindex(shared), part.reindex(shared)
+            conflicts = int((earlier.notna() & later.notna() & (earlier != later)).sum())
+            if conflicts:
+                print(f"  Warning: {conflicts} key(s) have a different '{col}' in {name} than in an earlier file; "
+                      f"keeping the earlier value.")
+            combined = combined.combine_first(part)
+        columns.append(combined)
+
+    merged = pd.concat([common] + columns, axis=1, join='outer', sort=False)
+    if merge_key:
+        merged = merged.reset_index()
+
+    ordered = [col for col in EXPECTED_COMMON_COLS if col in merged.columns]
+    return merged[ordered + [col for col in merged.columns if col not in ordered]]
+
+
+def merge_csv_files(csv_files, output_path, key=MERGE_KEY):
     """
     Merge multiple CSV files with common and unique columns.
     
     Args:
         csv_files (list): List of CSV file paths
         output_path (str): Path for the output merged CSV file
+        key (list): Columns identifying a row across files
         
     Returns:
         bool: True if successful, False otherwise
@@ -138,7 +243,7 @@ def merge_csv_files(csv_files, output_path):
         })
         
         all_common_cols.update(common_cols)
-        all_unique_cols.extend(unique_cols)
+        all_unique_cols.extend(col for col in unique_cols if col not in all_unique_cols)
     
     if not file_data:
         print("Error: No valid CSV files to process.")
@@ -150,45 +255,22 @@ def merge_csv_files(csv_files, output_path):
     print(f"  - Common columns: {sorted(all_common_cols)}")
     print(f"  - Unique columns: {all_unique_cols}")
     
-    # Start with the first file as base
-    base_df = file_data[0]['df'].copy()
-    merge_key = 'base_question_id'  # Primary key for merging
-    
-    # Check if merge key exists
-    if merge_key not in base_df.columns:
-        print(f"Warning: '{merge_key}' not found. Using row index for merging.")
+    # Merge on the composite key if every file has it, otherwise fall back to row order
+    merge_key = list(key)
+    missing_key_files = [Path(item['path']).name for item in file_data
+                         if not all(col in item['df'].columns for col in merge_key)]
+    if missing_key_files:
+        print(f"Warning: key columns {merge_key} not found in {missing_key_files}. "
+              f"Using row index for merging.")
         merge_key = None
-    
-    # Merge each subsequent file
-    for i in range(1, len(file_data)):
-        current_file = file_data[i]
-        current_df = current_file['df']
-        
-        print(f"Merging file {i+1}: {Path(current_file['path']).name}")
-        
-        if merge_key and merge_key in current_df.columns:
-            # Merge on base_question_id
-            # Only merge the unique columns to avoid duplicating common columns
-            unique_cols_to_merge = current_file['unique_cols']
-            if unique_cols_to_merge:
-                merge_cols = [merge_key] + unique_cols_to_merge
-                temp_df = current_df[merge_cols]
-                base_df = base_df.merge(temp_df, on=merge_key, how='left')
-            else:
-                print(f"  Warning: No unique columns found in {current_file['path']}")
-        else:
-            # Merge by index if no common key
-            unique_cols_to_merge = current_file['unique_cols']
-            if unique_cols_to_merge:
-                for col in unique_cols_to_merge:
-                    if len(current_df) == len(base_df):
-                        base_df[col] = current_df[col].values
-                    else:
-                        print(f"  Warning: Row count mismatch for {current_file['path']}")
-    
+
+    base_df = merge_frames(file_data, merge_key)
+    if base_df is None:
+        return False
+
     # Save the merged dataframe
     try:
-        base_df.to_csv(output_path, index=False)
+        write_table(base_df, output_path)
         print(f"\n✓ Successfully merged {len(file_data)} files!")
         print(f"✓ Output saved to: {output_path}")
         print(f"✓ Final dataset shape: {base_df.shape[0]} rows × {base_df.shape[1]} columns")
@@ -200,48 +282,211 @@ def merge_csv_files(csv_files, output_path):
         return False
 
 
-def main():
+def read_sorted_rows(file_path, key, chunk_size):
+    """
+    Yield (key, row) pairs from a CSV file sorted by `key`, reading `chunk_size` rows at a time.
+
+    Duplicate keys are reported and skipped; a key that sorts before the previous
+    one means the file is not sorted, which streaming mode cannot recover from.
+    """
+    name = Path(file_path).name
+    previous = None
+    with open(file_path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.DictReader(infile)
+        while True:
+            chunk = [row for _, row in zip(range(chunk_size), reader)]
+            if not chunk:
+                return
+            for row in chunk:
+                row_key = tuple(row[col] for col in key)
+                if previous is not None and row_key == previous:
+                    print(f"  Warning: duplicate key {row_key} in {name}; keeping the first row.")
+                    continue
+                if previous is not None and row_key < previous:
+                    raise ValueError(f"'{name}' is not sorted by {key} (found {row_key} after {previous}). "
+                                     f"Sort it first or merge without --streaming.")
+                previous = row_key
+                yield row_key, row
+
+
+def stream_merge_csv_files(csv_files, output_path, key=MERGE_KEY, chunk_size=10000):
+    """
+    Merge CSV files that are each sorted by `key`, holding one chunk per file in memory.
+
+    Works like a sorted merge join: at every step the smallest key among the
+    files' current rows is written out with the unique columns of every file
+    that has it; files without that key leave their columns empty.
+
+    Args:
+        csv_files (list): List of CSV file paths, each sorted by key (as text)
+        output_path (str): Path for the output merged CSV file
+        key (list): Columns identifying a row across files
+        chunk_size (int): Rows read from each file at a time
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    key = list(key)
+    headers = []
+    for file_path in csv_files:
+        with open(file_path, mode='r', encoding='utf-8', newline='') as infile:
+            header = next(csv.reader(infile), [])
+        missing = [col for col in key if col not in header]
+        if missing:
+            print(f"Error: {Path(file_path).name} is missing key columns {missing}.")
+            return False
+        headers.append(header)
+
+    common_cols = [col for col in EXPECTED_COMMON_COLS if any(col in header for header in headers)]
+    for col in key:
+        if col not in common_cols:
+            common_cols.append(col)
+    unique_cols = []
+    for header in headers:
+        unique_cols.extend(col for col in header if col not in common_cols and col not in unique_cols)
+    fieldnames = common_cols + unique_cols
+
+    iterators = [read_sorted_rows(file_path, key, chunk_size) for file_path in csv_files]
+    heads = [next(iterator, None) for iterator in iterators]
+    missing_counts = [0] * len(csv_files)
+    rows_written = 0
+
+    try:
+        with open(output_path, mode='w', encoding='utf-8', newline='') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            while any(head is not None for head in heads):
+                current = min(head[0] for head in heads if head is not None)
+                merged = {}
+                for i, head in enumerate(heads):
+                    if head is None or head[0] != current:
+                        missing_counts[i] += 1
+                        continue
+                    row = head[1]
+                    # Common columns come from the first file that has the key
+                    for col, value in row.items():
+                        if col not in merged or (col in unique_cols and not merged[col]):
+                            merged[col] = value
+                    heads[i] = next(iterators[i], None)
+                writer.writerow(merged)
+                rows_written += 1
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+
+    for file_path, count in zip(csv_files, missing_counts):
+        if count:
+            print(f"  Warning: {count} key(s) missing from {Path(file_path).name}; their columns are left empty.")
+    print(f"\n✓ Successfully merged {len(csv_files)} files!")
+    print(f"✓ Output saved to: {output_path}")
+    print(f"✓ Final dataset shape: {rows_written} rows × {len(fieldnames)} columns")
+    return True
+
+
+def expand_inputs(patterns):
+    """
+    Expand file paths and glob patterns into a de-duplicated, ordered list of CSV files.
+    """
+    csv_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"Warning: '{pattern}' did not match any files.")
+        for match in matches:
+            if match not in csv_files:
+                csv_files.append(match)
+    return csv_files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge response CSVs that share common columns.")
+    parser.add_argument('inputs', nargs='*', help="CSV files or glob patterns to merge")
+    parser.add_argument('-o', '--output', default='merged_csv.csv', help="Path of the merged CSV")
+    parser.add_argument('--key', default=','.join(MERGE_KEY),
+                        help="Comma-separated key columns (default: %(default)s)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Merge inputs already sorted by the key without loading them into memory")
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help="Rows read per file at a time in streaming mode")
+    return parser.parse_args(argv)
+
+
+def run_interactive():
+    """
+    Ask for the input files and output path on the terminal.
+    """
+    # Get CSV files from user
+    csv_files = get_csv_files()
+
+    if not csv_files:
+        print("No CSV files provided. Exiting.")
+        return None, None
+
+    # Get output file path
+    print(f"\nYou've selected {len(csv_files)} CSV files to merge:")
+    for i, file_path in enumerate(csv_files, 1):
+        print(f"  {i}. {Path(file_path).name}")
+
+    # Suggest output filename
+    default_output = "merged_csv.csv"
+    output_path = input(f"\nEnter output file path (default: {default_output}): ").strip()
+
+    if not output_path:
+        output_path = default_output
+    return csv_files, output_path
+
+
+def main(argv=None):
     """
     Main function to orchestrate the CSV merging process.
+
+    Returns:
+        int: Process exit code
     """
+    args = parse_args(argv)
     try:
-        # Get CSV files from user
-        csv_files = get_csv_files()
-        
-        if not csv_files:
-            print("No CSV files provided. Exiting.")
-            return
-        
-        # Get output file path
-        print(f"\nYou've selected {len(csv_files)} CSV files to merge:")
-        for i, file_path in enumerate(csv_files, 1):
-            print(f"  {i}. {Path(file_path).name}")
-        
-        # Suggest output filename
-        default_output = "/Users/sulavshrestha/Documents/[1] Academics/Capstone/[0] Code/Prompt_Generation/merged_csv_output.csv"
-        output_path = input(f"\nEnter output file path (default: {default_output}): ").strip()
-        
-        if not output_path:
-            output_path = default_output
-        
-        # Ensure output has .csv extension
-        if not output_path.lower().endswith('.csv'):
+        if args.inputs:
+            csv_files = expand_inputs(args.inputs)
+            missing = [path for path in csv_files if not os.path.exists(path)]
+            if missing:
+                print(f"Error: File(s) {missing} do not exist.")
+                return 1
+            if len(csv_files) < 2:
+                print("Error: You need at least 2 CSV files to merge.")
+                return 1
+            output_path = args.output
+        else:
+            csv_files, output_path = run_interactive()
+            if not csv_files:
+                return 1
+
+        # Ensure output has a table extension (.csv unless Parquet/Arrow was asked for)
+        if not output_path.lower().endswith(TABLE_SUFFIXES):
             output_path += '.csv'
-        
+
         # Perform the merge
-        success = merge_csv_files(csv_files, output_path)
-        
+        key = [col.strip() for col in args.key.split(',') if col.strip()]
+        if args.streaming and not all(path.lower().endswith('.csv') for path in csv_files + [output_path]):
+            print("Error: --streaming reads and writes CSV files only.")
+            return 1
+        if args.streaming:
+            success = stream_merge_csv_files(csv_files, output_path, key=key, chunk_size=args.chunk_size)
+        else:
+            success = merge_csv_files(csv_files, output_path, key=key)
+
         if success:
             print(f"\n🎉 Merge completed successfully!")
             print(f"📁 Merged file location: {output_path}")
-        else:
-            print(f"\n❌ Merge failed. Please check the error messages above.")
-            
+            return 0
+        print(f"\n❌ Merge failed. Please check the error messages above.")
+        return 1
+
     except KeyboardInterrupt:
         print(f"\n\nOperation cancelled by user.")
     except Exception as e:
         print(f"\nUnexpected error: {str(e)}")
+    return 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Streaming Generate-then-Score Pipeline
+
+Runs generation and scoring at the same time instead of one after the other:
+every prompt row is fanned out to the providers (as in generate_responses.py),
+and as soon as a row has all its responses it goes through a bounded queue to
+a pool of scoring processes (as in master_evaluator.py). Scored rows are
+appended, in prompt order, to `<output>.partial`, which can be read while the
+run is in progress; it replaces the output once every row is scored. Total
+wall time is roughly the longer of generation and scoring, not their sum.
+
+The output has the master_scores layout (responses plus metric columns; it is
+written to `computed_scores.csv` by default, not over the committed table) and
+its score fingerprints are recorded in `<output>.state.sqlite`, so a later
+`master_evaluator.py` run on the same table only rescores what changed. With
+--resume, good responses in a previous output are not requested again (they
+are kept in `<output>.carry` until the run finishes, see prompt_runner.py). At the
+end the responses can be exported as text files (--export-txt) or as a single
+pack file (--export-pack), see response_export.py.
+
+Examples:
+
+    python pipeline.py --providers claude gemini openai --workers 4
+    python pipeline.py --providers fake --latency 0.5 --concurrency fake=16 --output /tmp/scores.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from generate_responses import build_providers, parse_concurrency
+from master_evaluator import (CONCRETENESS_LEXICON, METRICS, OUTPUT_FILE, STATE_SUFFIX, TAALES_LEXICON, ScoreState,
+                              fingerprint, init_worker, load_lexicons, metric_column_names,
+                              metric_versions, response_models, row_keys, score_rows)
+from prompt_grid import open_prompts, parse_cells, parse_shard, resolve_cells
+from prompt_runner import (DEFAULT_SAMPLES, KEY_COLUMNS, PARTIAL_SUFFIX, PROMPT_COLUMN_NAME, carry_over, drop_carry,
+                           row_key, run_prompts)
+from providers import PROVIDERS
+from request_metrics import METRICS_SUFFIX, MetricsLog
+from response_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ResponseCache
+from response_export import export_files, write_pack
+from table_io import read_table, table_format, write_table
+
+
+INPUT_CSV_FILE = 'generated_prompts.csv'
+
+# Finished rows waiting to be scored; generation pauses when the queue is full
+DEFAULT_QUEUE_SIZE = 256
+
+# Most rows handed to a scoring process at once
+DEFAULT_BATCH_ROWS = 64
+
+
+class ScoringError(RuntimeError):
+    """A scoring process or the scored-row writer failed; generation stops."""
+
+
+class StreamingScorer:
+    """
+    Scores rows as they are put() and appends them, in the order they were
+    put, to a CSV file.
+
+    A background thread drains the bounded queue into batches, sends each
+    batch to a process pool and writes the scored batches back in order.
+    """
+
+    def __init__(self, path, input_columns, workers=None, concreteness_path=CONCRETENESS_LEXICON,
+                 taales_path=TAALES_LEXICON, queue_size=DEFAULT_QUEUE_SIZE, batch_rows=DEFAULT_BATCH_ROWS):
+        self.path = path
+        self.input_columns = input_columns
+        self.models = response_models(input_columns)
+        self.columns = input_columns + metric_column_names(self.models)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_rows = batch_rows
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Compile any stale lexicon index here, so the workers only ever map finished files
+        load_lexicons(concreteness_path, taales_path)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(concreteness_path, taales_path))
+        self.versions = metric_versions(concreteness_path, taales_path)
+        self.cells = []
+        self.rows_written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, row):
+        """Queue a row for scoring; blocks while the queue is full."""
+        while True:
+            if self.error is not None:
+                raise ScoringError(f"Scoring failed: {self.error!r}") from self.error
+            try:
+                self.queue.put(row, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """Wait until every queued row is scored and written."""
+        if self.error is None:
+            self.put(None)
+        self.thread.join()
+        self.executor.shutdown()
+        if self.error is not None:
+            raise ScoringError(f"Scoring failed: {self.error!r}") from self.error
+        return self.rows_written
+
+    def _next_batch(self):
+        """Block for one row, then take whatever else is already waiting. None marks the end."""
+        batch = [self.queue.get()]
+        while batch[-1] is not None and len(batch) < self.batch_rows:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, outfile, scored):
+        scored.to_csv(outfile, header=False, index=False)
+        outfile.flush()
+        self.rows_written += len(scored)
+        keys = row_keys(scored)
+        if keys is not None:
+            for model in self.models:
+                for key, text in zip(keys, scored[f"{model}_response"].tolist()):
+                    fp = fingerprint(text)
+                    self.cells.extend((key, model, family, fp, self.versions[family]) for family, _, _, _ in METRICS)
+        print(f"Scored {self.rows_written} rows.")
+
+    def _run(self):
+        pending = deque()
+        try:
+            with open(self.path, mode='w', encoding='utf-8', newline='') as outfile:
+                csv.writer(outfile, lineterminator='\n').writerow(self.columns)
+                done = False
+                while not done:
+                    batch = self._next_batch()
+                    if batch[-1] is None:
+                        batch.pop()
+                        done = True
+                    if batch:
+                        frame = pd.DataFrame(batch, columns=self.input_columns)
+                        pending.append(self.executor.submit(score_rows, frame))
+                    # Write finished batches in order; wait only when every worker is busy
+                    while pending and (done or len(pending) >= self.workers or pending[0].done()):
+                        self._write(outfile, pending.popleft().result())
+        except BaseException as e:
+            self.error = e
+            for future in pending:
+                future.cancel()
+            # Unblock a producer waiting on a full queue
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+
+def run_pipeline(input_path, output_path, providers, prompt_column=PROMPT_COLUMN_NAME, resume=False,
+                 cache=None, workers=None, concreteness_path=CONCRETENESS_LEXICON, taales_path=TAALES_LEXICON,
+                 queue_size=DEFAULT_QUEUE_SIZE, batch_rows=DEFAULT_BATCH_ROWS, metrics=None,
+                 samples=DEFAULT_SAMPLES, cells=None):
+    """
+    Generate responses for every prompt row and score each row as soon as it is complete.
+
+    Args:
+        input_path (str): Path to the prompts CSV
+        output_path (str): Score table to write (.csv, .parquet or .arrow)
+        providers (list): Provider adapters; one response column per provider
+        prompt_column (str): Name of the column holding the prompt
+        resume (bool): Reuse good responses from a previous output / checkpoint
+        cache (ResponseCache): Optional response cache; None bypasses caching
+        workers (int): Scoring processes (default: CPU count)
+        concreteness_path, taales_path (str): Lexicon CSVs or compiled indexes
+        queue_size (int): Finished rows that may wait for scoring before generation pauses
+        batch_rows (int): Most rows sent to a scoring process at once
+        metrics (MetricsLog): Optional per-request metrics log
+        samples (int): Requests per unique prompt; None sends one request per row
+        cells (tuple): Optional (start, stop) range of input rows to process
+
+    Returns:
+        int: Number of rows generated and scored
+
+    Raises:
+        ScoringError: If scoring fails; generation is stopped and the output is not replaced
+    """
+    partial_path = output_path + PARTIAL_SUFFIX
+    response_columns = [provider.response_column for provider in providers]
+    completed = {}
+    if resume:
+        # The checkpoint is always CSV; a Parquet / Arrow output is not read back
+        previous = [partial_path] + ([output_path] if table_format(output_path) == 'csv' else [])
+        completed = carry_over(output_path, response_columns, paths=previous)
+        if completed:
+            done = sum(len(responses) for responses in completed.values())
+            print(f"Resuming: found {done} good responses in previous output.")
+
+    with open_prompts(input_path, cells) as (prompt_columns, reader):
+        input_columns = prompt_columns + [column for column in response_columns if column not in prompt_columns]
+        missing = [column for column in KEY_COLUMNS if column not in input_columns]
+        if resume and missing:
+            raise ValueError(f"Cannot resume '{input_path}': missing key columns {missing}.")
+
+        def rows():
+            for row in reader:
+                if completed:
+                    row.update(completed.get(row_key(row), {}))
+                yield row
+
+        scorer = StreamingScorer(partial_path, input_columns, workers=workers, concreteness_path=concreteness_path,
+                                 taales_path=taales_path, queue_size=queue_size, batch_rows=batch_rows)
+        try:
+            count = asyncio.run(run_prompts(rows(), providers, on_result=lambda index, row: scorer.put(row),
+                                            prompt_column=prompt_column, cache=cache, metrics=metrics,
+                                            samples=samples))
+        finally:
+            scorer.close()
+
+    if table_format(output_path) == 'csv':
+        os.replace(partial_path, output_path)
+    else:
+        write_table(pd.read_csv(partial_path, float_precision='round_trip'), output_path)
+        os.remove(partial_path)
+    drop_carry(output_path)
+
+    state = ScoreState(output_path + STATE_SUFFIX)
+    try:
+        state.clear()
+        state.update(scorer.cells)
+    finally:
+        state.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate model responses and score them as they arrive.")
+    parser.add_argument('--input', default=INPUT_CSV_FILE, help="Prompts CSV or prompt grid spec (.json) to read")
+    rows_group = parser.add_mutually_exclusive_group()
+    rows_group.add_argument('--cells', type=parse_cells, default=None, metavar='START:STOP',
+                            help="Only process this range of input rows / grid cells")
+    rows_group.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                            help="Only process shard I of N equal contiguous row ranges")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="Score table to write (.csv or .parquet)")
+    parser.add_argument('--providers', nargs='+', default=['claude', 'gemini', 'openai'],
+                        choices=sorted(PROVIDERS), help="Providers to query for every prompt")
+    parser.add_argument('--prompt-column', default=PROMPT_COLUMN_NAME, help="Column holding the prompt")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reuse good responses from a previous output; only request missing or failed rows")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the response cache")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help="SQLite response cache file")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="Evict least recently used responses beyond this size")
+    parser.add_argument('--concurrency', nargs='*', metavar='NAME=N',
+                        help="Requests in flight per provider (default: $<NAME>_CONCURRENCY or 4)")
+    parser.add_argument('--metrics', default=None,
+                        help=f"Per-request metrics JSONL (default: <output>{METRICS_SUFFIX})")
+    parser.add_argument('--no-metrics', action='store_true', help="Do not record per-request metrics")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help="Requests per unique prompt; rows sharing a prompt reuse its responses")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="Send one request per row, even for repeated prompts")
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help="Kept-alive HTTP connections per API key (default: {NAME}_POOL_SIZE or the concurrency)")
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help="Stream responses (records time to first token; default: {NAME}_STREAM)")
+    parser.add_argument('--max-output-bytes', type=int, default=None,
+                        help="Cut responses off at this many UTF-8 bytes (default: {NAME}_MAX_OUTPUT_BYTES)")
+    parser.add_argument('--max-output-tokens', type=int, default=None,
+                        help="Cap completions on the API side (default: {NAME}_MAX_OUTPUT_TOKENS)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean latency of the fake provider")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Latency jitter of the fake provider")
+    parser.add_argument('--response-chars', type=int, default=800, help="Response length of the fake provider")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument('--concreteness-lexicon', default=CONCRETENESS_LEXICON,
+                        help="CSV with word, rating columns (or its compiled .lex.npy)")
+    parser.add_argument('--taales-lexicon', default=TAALES_LEXICON,
+                        help="CSV with word, ease, academic columns (or its compiled .lex.npy)")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Finished rows that may wait for scoring before generation pauses")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS,
+                        help="Most rows sent to a scoring process at once")
+    parser.add_argument('--export-txt', metavar='DIR', default=None,
+                        help="Also write one .txt per response into DIR (only changed files are rewritten)")
+    parser.add_argument('--export-pack', metavar='PATH', default=None,
+                        help="Also write every response into a single indexed pack file")
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("--samples must be at least 1")
+    samples = None if args.no_dedup else args.samples
+
+    load_dotenv()
+    try:
+        providers = build_providers(args.providers, parse_concurrency(args.concurrency),
+                                    latency=args.latency, jitter=args.jitter,
+                                    response_chars=args.response_chars, stream=args.stream,
+                                    max_output_bytes=args.max_output_bytes,
+                                    max_output_tokens=args.max_output_tokens, pool_size=args.pool_size)
+    except (ValueError, ImportError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    print(f"Generating and scoring '{args.input}' into '{args.output}' with "
+          f"{', '.join(f'{p.label} ({p.concurrency} in flight)' for p in providers)}...")
+    cache = None if args.no_cache else ResponseCache(args.cache_path, int(args.cache_max_mb * 1024 * 1024))
+    metrics = None if args.no_metrics else MetricsLog(args.metrics or args.output + METRICS_SUFFIX)
+    start = time.perf_counter()
+    try:
+        cells = resolve_cells(args.input, args.cells, args.shard)
+        count = run_pipeline(args.input, args.output, providers, prompt_column=args.prompt_column,
+                             resume=args.resume, cache=cache, workers=args.workers,
+                             concreteness_path=args.concreteness_lexicon, taales_path=args.taales_lexicon,
+                             queue_size=args.queue_size, batch_rows=args.batch_rows, metrics=metrics,
+                             samples=samples, cells=cells)
+        elapsed = time.perf_counter() - start
+        print(f"\nPipeline complete. {count} rows in {elapsed:.2f}s ({count / elapsed:.1f} rows/sec) "
+              f"saved to '{args.output}'.")
+        if args.export_txt or args.export_pack:
+            responses = read_table(args.output, columns=list(KEY_COLUMNS) + [p.response_column for p in providers])
+            if args.export_txt:
+                counts = export_files(responses, args.export_txt)
+                print(f"Exported responses to '{args.export_txt}': {counts['written']} written, "
+                      f"{counts['unchanged']} unchanged.")
+            if args.export_pack:
+                print(f"Packed {write_pack(responses, args.export_pack)} responses into '{args.export_pack}'.")
+    except FileNotFoundError:
+        print(f"Error: The file '{args.input}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except ScoringError as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    finally:
+        if metrics is not None:
+            print(metrics.summary())
+            metrics.close()
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
+        for provider in providers:
+            provider.close()
+
+
+if __name__ == "__main__":
+    main()
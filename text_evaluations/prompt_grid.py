@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Prompt Grid
+
+Expands a grid spec (question bank × personas × prompt templates) into
+prompt rows lazily, one row at a time, instead of materializing the whole
+cross product as a prompts CSV. The rows have the same columns as
+`generated_prompts.csv`, so every generation script accepts a grid spec
+wherever it accepts a prompts CSV (`--input prompt_grid.json`).
+
+A spec is a JSON file:
+
+    {
+      "questions": "question_bank.csv",
+      "personas": [{"name": "Barbara Liskov", "perspective": "a pioneer in software design"}, ...],
+      "prompt_types": {"vanilla": "{question}",
+                       "mentor_persona": "{persona}, from your perspective as {perspective}, ..."}
+    }
+
+- questions – a CSV (path relative to the spec) with base_question_id,
+  category and base_question columns, read as a stream, or an inline list
+  of objects with the same keys. An optional `personas` column (names
+  separated by ';') limits a question to those personas; otherwise it is
+  crossed with every persona.
+- prompt_types – template per prompt_type, filled with {question},
+  {persona}, {perspective} and {category}.
+
+Cells are expanded question by question, then persona, then prompt_type, in
+spec order, and keyed by (base_question_id, assigned_persona, prompt_type).
+As long as the question bank only grows at the end, a cell keeps its key and
+its position, so a sweep can be split into position ranges (`--cells
+START:STOP` or `--shard I/N`) that are generated independently.
+
+Usage:
+    python prompt_grid.py prompt_grid.json --count
+    python prompt_grid.py prompt_grid.json --head 6
+    python prompt_grid.py prompt_grid.json --output prompts.csv --shard 0/4
+"""
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import string
+import sys
+
+
+GRID_FILE = 'prompt_grid.json'
+GRID_SUFFIXES = ('.json',)
+
+# Columns of a prompt row, as in generated_prompts.csv
+PROMPT_FIELDS = ['base_question_id', 'category', 'base_question', 'assigned_persona', 'prompt_type',
+                 'generated_prompt']
+TEMPLATE_FIELDS = {'question', 'persona', 'perspective', 'category'}
+PERSONA_SEPARATOR = ';'
+
+
+def is_grid(path):
+    """True if `path` is a grid spec rather than a prompts CSV."""
+    return os.path.splitext(str(path))[1].lower() in GRID_SUFFIXES
+
+
+class PromptGrid:
+    """
+    A grid spec, expanded on demand.
+
+        grid = PromptGrid('prompt_grid.json')
+        for row in grid.rows(0, 1000):
+            ...
+    """
+
+    def __init__(self, path=GRID_FILE):
+        self.path = path
+        with open(path, mode='r', encoding='utf-8') as infile:
+            spec = json.load(infile)
+        try:
+            self.question_source = spec['questions']
+            self.personas = [(persona['name'], persona.get('perspective', '')) for persona in spec['personas']]
+            self.templates = list(spec['prompt_types'].items())
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid grid spec '{path}': {e!r}") from None
+        for prompt_type, template in self.templates:
+            fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+            if fields - TEMPLATE_FIELDS:
+                raise ValueError(f"Template '{prompt_type}' in '{path}' uses unknown fields "
+                                 f"{sorted(fields - TEMPLATE_FIELDS)}; use {sorted(TEMPLATE_FIELDS)}.")
+        self.perspectives = dict(self.personas)
+
+    def questions(self):
+        """Yield (id, category, question, persona names) for every question, streaming a CSV bank."""
+        if isinstance(self.question_source, list):
+            for question in self.question_source:
+                yield (str(question['base_question_id']), question.get('category', ''), question['base_question'],
+                       question.get('personas'))
+            return
+        bank_path = os.path.join(os.path.dirname(self.path), self.question_source)
+        with open(bank_path, mode='r', encoding='utf-8', newline='') as infile:
+            for row in csv.DictReader(infile):
+                names = (row.get('personas') or '').strip()
+                yield (row['base_question_id'], row.get('category', ''), row['base_question'],
+                       [name.strip() for name in names.split(PERSONA_SEPARATOR)] if names else None)
+
+    def personas_for(self, names):
+        """The personas a question is crossed with: the listed ones, or all of them."""
+        if not names:
+            return self.personas
+        unknown = [name for name in names if name not in self.perspectives]
+        if unknown:
+            raise ValueError(f"Unknown personas {unknown} in the question bank of '{self.path}'.")
+        return [(name, self.perspectives[name]) for name in names]
+
+    def count(self):
+        """
+        Number of cells in the grid; also checks that question ids are unique.
+
+        Returns:
+            int: Cell count
+        """
+        total = 0
+        seen = set()
+        for question_id, _, _, names in self.questions():
+            if question_id in seen:
+                raise ValueError(f"Question id {question_id} appears twice in '{self.path}'.")
+            seen.add(question_id)
+            total += len(self.personas_for(names)) * len(self.templates)
+        return total
+
+    def rows(self, start=0, stop=None):
+        """
+        Yield the prompt rows of cells start..stop-1 (all cells by default).
+
+        Whole questions before `start` are skipped without building their prompts.
+        """
+        position = 0
+        for question_id, category, question, names in self.questions():
+            if stop is not None and position >= stop:
+                return
+            personas = self.personas_for(names)
+            size = len(personas) * len(self.templates)
+            if position + size <= start:
+                position += size
+                continue
+            for persona, perspective in personas:
+                for prompt_type, template in self.templates:
+                    if start <= position and (stop is None or position < stop):
+                        prompt = template.format(question=question, persona=persona, perspective=perspective,
+                                                 category=category)
+                        yield {'base_question_id': question_id, 'category': category, 'base_question': question,
+                               'assigned_persona': persona, 'prompt_type': prompt_type,
+                               'generated_prompt': prompt}
+                    position += 1
+
+
+def count_rows(path):
+    """Number of prompt rows of a grid spec or prompts CSV."""
+    if is_grid(path):
+        return PromptGrid(path).count()
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        return sum(1 for _ in csv.DictReader(infile))
+
+
+def shard_range(total, index, count):
+    """
+    Cell positions [start, stop) of shard `index` of `count` contiguous shards.
+
+    Returns:
+        tuple: (start, stop)
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard {index} is out of range for {count} shards.")
+    return total * index // count, total * (index + 1) // count
+
+
+def parse_cells(value):
+    """'100:200' -> (100, 200); '100:' -> (100, None)."""
+    start, separator, stop = value.partition(':')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Invalid cell range '{value}'; expected START:STOP.")
+    try:
+        return int(start or 0), int(stop) if stop else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid cell range '{value}'; expected START:STOP.") from None
+
+
+def parse_shard(value):
+    """'2/8' -> (2, 8)."""
+    index, separator, count = value.partition('/')
+    if not separator or not index.isdigit() or not count.isdigit() or int(count) < 1:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}'; expected INDEX/COUNT, e.g. 0/4.")
+    return int(index), int(count)
+
+
+def resolve_cells(path, cells=None, shard=None):
+    """
+    The (start, stop) row range to generate, from --cells or --shard, or None for all rows.
+    """
+    if shard is not None:
+        return shard_range(count_rows(path), *shard)
+    return cells
+
+
+@contextlib.contextmanager
+def open_prompts(path, cells=None):
+    """
+    Open a prompts CSV or a grid spec as (fieldnames, row iterator).
+
+    Args:
+        path (str): Prompts CSV or grid spec (.json)
+        cells (tuple): Optional (start, stop) row range; stop may be None
+
+    Yields:
+        tuple: (column names, iterator of dict rows)
+    """
+    start, stop = cells or (0, None)
+    if is_grid(path):
+        rows = PromptGrid(path).rows(start, stop)
+        try:
+            yield list(PROMPT_FIELDS), rows
+        finally:
+            rows.close()
+        return
+    with open(path, mode='r', encoding='utf-8', newline='') as infile:
+        reader = csv.DictReader(infile)
+        yield list(reader.fieldnames or []), itertools.islice(reader, start, stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand a prompt grid spec into prompt rows.")
+    parser.add_argument('spec', nargs='?', default=GRID_FILE, help="Grid spec (JSON)")
+    parser.add_argument('--count', action='store_true', help="Only print the number of cells")
+    parser.add_argument('--head', type=int, default=None, help="Print the first N rows")
+    parser.add_argument('--output', default=None, help="Write the rows to this CSV")
+    parser.add_argument('--cells', type=parse_cells, default=None, metavar='START:STOP',
+                        help="Only this range of cell positions")
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='I/N',
+                        help="Only shard I of N equal contiguous ranges")
+    args = parser.parse_args()
+
+    if args.count:
+        print(f"{PromptGrid(args.spec).count()} cells in '{args.spec}'.")
+        return
+    cells = resolve_cells(args.spec, args.cells, args.shard)
+    if args.head is not None:
+        start, stop = cells or (0, None)
+        cells = start, start + args.head if stop is None else min(stop, start + args.head)
+    with open_prompts(args.spec, cells) as (fieldnames, rows):
+        if args.output:
+            with open(args.output, mode='w', encoding='utf-8', newline='') as outfile:
+                writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+                writer.writeheader()
+                count = 0
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            print(f"✓ Wrote {count} prompt rows to '{args.output}'.")
+        else:
+            writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Concurrent Prompt Runner
+
+Sends prompts to one or more model providers with a bounded number of requests
+in flight per provider instead of one request at a time. Results are handed
+back in input order as soon as every earlier row has finished, so the output
+CSV is written incrementally and keeps the same row order as the input.
+
+Provider calls are blocking SDK calls (see providers.py). Each provider gets a
+thread pool sized to its concurrency limit, so the SDK clients are used
+unchanged.
+
+With resume=True, rows that already hold a good response in the previous
+output (matched on KEY_COLUMNS, not row position) are reused, and only missing
+responses or responses starting with "Error:" are requested again. Before the
+checkpoint is rewritten, the reused responses are saved to `<output>.carry`,
+so a run interrupted again loses none of them. A
+ResponseCache (see response_cache.py) answers unchanged prompts without an
+API call. With a MetricsLog (see request_metrics.py), every request's timings,
+tokens, retries and outcome are recorded.
+
+Prompt grids repeat prompt strings (e.g. the same vanilla question under every
+persona), so rows are deduplicated per provider on the exact prompt text and
+generation parameters: each unique prompt is sent `samples` times at most (once
+by default), and the k-th row using it receives sample k % samples. Rows that
+share a request wait for it instead of sending their own, and are recorded in
+the metrics as 'deduplicated'. samples=None sends one request per row. Only
+the DEDUP_WINDOW most recently used prompts are remembered, so memory stays
+flat however long the input is (grid expansions put repeated prompts next
+to each other); a prompt seen again after that is answered by the cache.
+"""
+
+import asyncio
+import csv
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_grid import open_prompts
+from response_cache import make_key
+
+
+PROMPT_COLUMN_NAME = 'generated_prompt'
+
+# Columns that identify a prompt row independently of its position in the file
+KEY_COLUMNS = ('base_question_id', 'assigned_persona', 'prompt_type')
+
+# Suffix of the checkpoint file written while a run is in progress
+PARTIAL_SUFFIX = '.partial'
+
+# Good responses of earlier runs, kept until a resumed run has written its output
+CARRY_SUFFIX = '.carry'
+
+# Written by older OpenAI adapters in place of an empty response; never a usable response
+EMPTY_OUTPUT_PLACEHOLDER = "GPT-5 response received but output_text field is empty or missing"
+
+# Requests per unique prompt and parameters; rows beyond that reuse a response
+DEFAULT_SAMPLES = 1
+
+# Most recently used prompts remembered for deduplication, per run
+DEDUP_WINDOW = 10000
+
+
+def row_key(row):
+    """Return the composite key identifying a prompt row."""
+    return tuple(row[column] for column in KEY_COLUMNS)
+
+
+def has_response(value):
+    """Return True if a response cell holds a usable (non-empty, non-error) response."""
+    return bool(value) and not value.startswith('Error:') and value != EMPTY_OUTPUT_PLACEHOLDER
+
+
+def sample_key(provider, prompt, sample):
+    """
+    Cache key of one sample of a prompt. Sample 0 uses the plain request key,
+    so deduplicated and non-deduplicated runs share cached responses.
+    """
+    params = provider.params if not sample else {**provider.params, 'sample': sample}
+    return make_key(provider.name, provider.model, prompt, params)
+
+
+def load_completed(paths, response_columns):
+    """
+    Collect good responses from earlier runs, keyed by row_key().
+
+    Args:
+        paths (list): Output / checkpoint CSVs to read; missing files are skipped
+        response_columns (list): Response columns to collect
+
+    Returns:
+        dict: Row key -> {response column: response} for every good response found
+    """
+    completed = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, mode='r', encoding='utf-8', newline='') as infile:
+            reader = csv.DictReader(infile)
+            missing = [column for column in KEY_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Cannot resume from '{path}': missing key columns {missing}.")
+            for row in reader:
+                responses = completed.setdefault(row_key(row), {})
+                for column in response_columns:
+                    if has_response(row.get(column)):
+                        responses[column] = row[column]
+    return completed
+
+
+def carry_over(output_path, response_columns, paths=None):
+    """
+    Collect good responses from earlier runs and save them to `<output>.carry`
+    before the checkpoint they came from is rewritten.
+
+    The carry file is written atomically and is itself read again by the next
+    resume, so responses reused by a run that is interrupted once more are
+    never lost. Remove it with drop_carry() once the output is in place.
+
+    Args:
+        output_path (str): Output of the run being resumed
+        response_columns (list): Response columns to collect
+        paths (list): CSVs to collect from; the output and its checkpoint by default
+
+    Returns:
+        dict: Row key -> {response column: response}, as load_completed()
+    """
+    carry_path = output_path + CARRY_SUFFIX
+    if paths is None:
+        paths = [output_path, output_path + PARTIAL_SUFFIX]
+    completed = load_completed(list(paths) + [carry_path], response_columns)
+    tmp_path = carry_path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(list(KEY_COLUMNS) + list(response_columns))
+        for key, responses in completed.items():
+            writer.writerow(list(key) + [responses.get(column, '') for column in response_columns])
+    os.replace(tmp_path, carry_path)
+    return completed
+
+
+def drop_carry(output_path):
+    """Remove `<output>.carry` once the output holds every carried response."""
+    carry_path = output_path + CARRY_SUFFIX
+    if os.path.exists(carry_path):
+        os.remove(carry_path)
+
+
+async def run_prompts(rows, providers, on_result=None, prompt_column=PROMPT_COLUMN_NAME,
+                      window=None, cache=None, metrics=None, samples=DEFAULT_SAMPLES):
+    """
+    Send every row's prompt to each provider, with per-provider limits on calls in flight.
+
+    Args:
+        rows (iterable): Dict rows, each holding a prompt in `prompt_column`
+        providers (list): Provider adapters (see providers.py); each row's
+            response is stored under the provider's `response_column`.
+            Providers whose column already holds a good response are skipped.
+        on_result (callable): Called as on_result(index, row) in input order
+            once every provider has answered that row; an exception it raises
+            stops the run and is re-raised
+        prompt_column (str): Name of the column holding the prompt
+        window (int): Maximum number of rows started but not yet handed to
+            on_result; bounds memory when an early row is slow. Defaults to
+            4 × the largest provider concurrency.
+        cache (ResponseCache): Optional cache consulted before, and filled
+            after, every provider call
+        metrics (MetricsLog): Optional log receiving one record per request
+        samples (int): Requests per unique prompt and parameters, fanned out
+            to every row using that prompt; None sends one request per row
+
+    Returns:
+        int: Number of rows processed
+    """
+    window = window or 4 * max(provider.concurrency for provider in providers)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(window)
+    limits = {provider.name: asyncio.Semaphore(provider.concurrency) for provider in providers}
+    executors = {provider.name: ThreadPoolExecutor(max_workers=provider.concurrency)
+                 for provider in providers}
+    finished = {}
+    # The first exception raised by a row's task (e.g. by on_result) ends the run
+    state = {'next_index': 0, 'error': None}
+    tasks = set()
+    # Request key -> [rows that asked for it so far, {sample: task answering it}], least recent first
+    recent = OrderedDict()
+
+    async def ask(provider, index, row):
+        prompt = row[prompt_column]
+        key = sample_key(provider, prompt, 0)
+        if not samples:
+            return await request(provider, index, row, key)
+        entry = recent.get(key)
+        if entry is None:
+            entry = recent[key] = [0, {}]
+            if len(recent) > DEDUP_WINDOW:
+                recent.popitem(last=False)
+        else:
+            recent.move_to_end(key)
+        sample = entry[0] % samples
+        entry[0] += 1
+        task = entry[1].get(sample)
+        if task is None:
+            request_key = sample_key(provider, prompt, sample) if sample else key
+            task = entry[1][sample] = asyncio.ensure_future(request(provider, index, row, request_key))
+            response = await task
+            if not has_response(response):
+                # Later rows with this prompt try again rather than copying the error
+                entry[1].pop(sample, None)
+            return response
+        response = await task
+        if metrics is not None:
+            metrics.record({'provider': provider.name, 'model': provider.model, 'row': index,
+                            'prompt_type': row.get('prompt_type'), 'cached': False,
+                            'deduplicated': True, 'latency': 0.0})
+        return response
+
+    async def request(provider, index, row, key):
+        prompt = row[prompt_column]
+        record = {'provider': provider.name, 'model': provider.model, 'row': index,
+                  'prompt_type': row.get('prompt_type'), 'cached': False,
+                  'ready_at': time.perf_counter()}
+        if cache is not None:
+            cached = cache.get(key)
+            if has_response(cached):
+                if metrics is not None:
+                    del record['ready_at']
+                    metrics.record({**record, 'cached': True, 'latency': 0.0})
+                return cached
+        async with limits[provider.name]:
+            try:
+                response = await loop.run_in_executor(executors[provider.name], provider.generate,
+                                                      prompt, record)
+            except Exception as e:
+                print(f"An error occurred with {provider.label}: {e}")
+                response = f"Error: {e}"
+                record['error_class'] = type(e).__name__
+        if metrics is not None:
+            record.pop('ready_at', None)
+            record.setdefault('latency', 0.0)
+            record['response_chars'] = len(response)
+            metrics.record(record)
+        # A response cut off at the output byte ceiling is not the model's full answer
+        if cache is not None and has_response(response) and not record.get('truncated'):
+            cache.put(key, provider.name, provider.model, response)
+        return response
+
+    async def run_one(index, row):
+        todo = [provider for provider in providers if not has_response(row.get(provider.response_column))]
+        responses = await asyncio.gather(*(ask(provider, index, row) for provider in todo))
+        for provider, response in zip(todo, responses):
+            row[provider.response_column] = response
+        finished[index] = row
+        # Hand back every row that is now contiguous with what was already emitted
+        while state['next_index'] in finished:
+            done_row = finished.pop(state['next_index'])
+            if on_result is not None:
+                on_result(state['next_index'], done_row)
+            state['next_index'] += 1
+            slots.release()
+
+    def task_done(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None and state['error'] is None:
+            state['error'] = task.exception()
+            # The failed row never gives back its slot; wake the loop below if it is waiting for one
+            slots.release()
+
+    count = 0
+    try:
+        for index, row in enumerate(rows):
+            await slots.acquire()
+            if state['error'] is not None:
+                raise state['error']
+            task = asyncio.create_task(run_one(index, row))
+            tasks.add(task)
+            task.add_done_callback(task_done)
+            count += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        # Stop the rows still in flight when a row failed
+        outstanding = list(tasks)
+        for task in outstanding:
+            task.cancel()
+        if outstanding:
+            await asyncio.gather(*outstanding, return_exceptions=True)
+        for executor in executors.values():
+            executor.shutdown(wait=False)
+    return count
+
+
+def process_csv(input_path, output_path, providers, prompt_column=PROMPT_COLUMN_NAME, resume=False,
+                cache=None, metrics=None, samples=DEFAULT_SAMPLES, cells=None):
+    """
+    Read prompts from a CSV file or a prompt grid spec (see prompt_grid.py), fan
+    each one out to the providers and write the responses.
+
+    Rows are checkpointed to `output_path + PARTIAL_SUFFIX` as they finish; the
+    output file is only replaced once the run completes, so an interrupted run
+    can be picked up again with resume=True (see carry_over()).
+
+    Args:
+        input_path (str): Path to the prompts CSV or grid spec
+        output_path (str): Path of the CSV to write
+        providers (list): Provider adapters; one response column is added per provider
+        prompt_column (str): Name of the column holding the prompt
+        resume (bool): Reuse good responses from a previous output / checkpoint
+        cache (ResponseCache): Optional response cache; None bypasses caching
+        metrics (MetricsLog): Optional per-request metrics log
+        samples (int): Requests per unique prompt; None sends one per row
+        cells (tuple): Optional (start, stop) range of input rows to process
+
+    Returns:
+        int: Number of rows processed
+    """
+    partial_path = output_path + PARTIAL_SUFFIX
+    response_columns = [provider.response_column for provider in providers]
+    completed = carry_over(output_path, response_columns) if resume else {}
+    if completed:
+        done = sum(len(responses) for responses in completed.values())
+        print(f"Resuming: found {done} good responses in previous output.")
+
+    with open_prompts(input_path, cells) as (input_columns, reader):
+        fieldnames = input_columns + [column for column in response_columns if column not in input_columns]
+        missing = [column for column in KEY_COLUMNS if column not in fieldnames]
+        if resume and missing:
+            raise ValueError(f"Cannot resume '{input_path}': missing key columns {missing}.")
+
+        def rows():
+            for row in reader:
+                if completed:
+                    row.update(completed.get(row_key(row), {}))
+                yield row
+
+        with open(partial_path, mode='w', encoding='utf-8', newline='') as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+
+            def write_result(index, row):
+                writer.writerow(row)
+                outfile.flush()
+                print(f"Saved responses for row {index + 1}.")
+
+            count = asyncio.run(run_prompts(rows(), providers, on_result=write_result,
+                                            prompt_column=prompt_column, cache=cache, metrics=metrics,
+                                            samples=samples))
+
+    os.replace(partial_path, output_path)
+    drop_carry(output_path)
+    return count
@@ -0,0 +1,763 @@
+"""
+Model Provider Adapters
+
+Each adapter wraps one model API behind the same small interface so the
+generation pipeline does not care which SDK it is talking to:
+
+- `name` / `response_column` – e.g. 'claude' / 'claude_response'
+- `model` – model identifier sent to the API
+- `params` – generation parameters sent with every request (also part of
+  the response cache key)
+- `generate(prompt, metrics=None)` – returns the response text, retrying
+  rate-limited requests on the healthiest API key; fills `metrics` with the
+  request's timings, token usage, retries and key (see request_metrics.py)
+
+Adapters only need to implement `call(prompt, key_index)` and raise
+`RateLimited` when the API reports a rate limit; key loading, key selection,
+pacing and retries are shared.
+
+With stream=True, adapters that implement `call_stream()` consume the
+provider's response stream chunk by chunk: the time to the first text chunk
+is recorded, and the stream is cut off once the response reaches
+`max_output_bytes`, so a runaway completion costs neither memory nor
+waiting time. `max_output_tokens` caps the completion on the API side.
+Each API key gets one long-lived SDK client, created on first use and shared
+by every worker thread. Its keep-alive HTTP connection pool holds up to
+`pool_size` connections ({NAME}_POOL_SIZE, default: the concurrency) and keeps
+idle connections open for `keepalive` seconds ({NAME}_KEEPALIVE), longer
+than a typical rate-limit cooldown, so switching keys or retrying after a 429
+reuses warm connections instead of opening new TLS sessions.
+
+Importing this module and creating an adapter are cheap: an adapter only
+checks that its SDK is installed and loads its API keys, while the SDK itself
+is imported, and its clients built, on the first request. Dry runs, runs
+answered entirely from the cache and the fake adapter never load an SDK.
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from rate_limiter import KeyPool
+
+
+# How many times a rate-limited request is retried before the row is recorded as an error
+MAX_RATE_LIMIT_RETRIES = 8
+
+# Seconds an idle pooled connection stays open (the SDKs default to 5)
+DEFAULT_KEEPALIVE = 120.0
+
+# The Anthropic / OpenAI SDKs retry 429s on the same key on their own; every retry goes
+# through the KeyPool instead, so it can switch keys, honour retry-after and count it
+SDK_MAX_RETRIES = 0
+
+# Gemini reports its retry hint inside the error text ("retry_delay { seconds: 17 }")
+GEMINI_RETRY_DELAY = re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)')
+
+# Error for a GPT-5 response without any output text; it counts as a failed request
+OPENAI_EMPTY_OUTPUT = "GPT-5 response received but output_text field is empty or missing"
+
+
+class StreamCollector:
+    """
+    Accumulates streamed text chunks up to a byte ceiling.
+
+    add() returns False once a chunk goes past the ceiling, telling the
+    adapter to stop reading and close the stream; a response of exactly
+    max_bytes is kept whole and not marked truncated.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.chunks = []
+        self.size = 0
+        self.first_chunk_at = None
+        self.truncated = False
+
+    def add(self, text):
+        if not text:
+            return True
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        data = text.encode('utf-8')
+        if self.max_bytes is not None and self.size + len(data) > self.max_bytes:
+            data = data[:self.max_bytes - self.size]
+            self.chunks.append(data.decode('utf-8', errors='ignore'))
+            self.size += len(data)
+            self.truncated = True
+            return False
+        self.chunks.append(text)
+        self.size += len(data)
+        return True
+
+    def text(self):
+        return ''.join(self.chunks)
+
+
+def cap_bytes(text, max_bytes):
+    """Cut `text` to at most `max_bytes` UTF-8 bytes; returns (text, truncated)."""
+    if max_bytes is None:
+        return text, False
+    data = text.encode('utf-8')
+    if len(data) <= max_bytes:
+        return text, False
+    return data[:max_bytes].decode('utf-8', errors='ignore'), True
+
+
+class RateLimited(Exception):
+    """
+    Raised by an adapter when the API rejects a request with a rate limit.
+    Carries the server's retry-after (seconds) and response headers when known.
+    """
+
+    def __init__(self, message, retry_after=None, headers=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.headers = headers
+
+
+def load_api_keys(multi_env, single_env=None):
+    """
+    Read API keys from a comma-separated env var, falling back to a single key.
+
+    Args:
+        multi_env (str): Name of the comma-separated key variable (e.g. ANTHROPIC_API_KEYS)
+        single_env (str): Optional name of a single-key variable (e.g. ANTHROPIC_API_KEY)
+
+    Returns:
+        list: Non-empty list of API keys
+
+    Raises:
+        ValueError: If no keys are configured
+    """
+    keys_str = os.getenv(multi_env)
+    if keys_str:
+        keys = [key.strip() for key in keys_str.split(',') if key.strip()]
+    elif single_env and os.getenv(single_env):
+        keys = [os.getenv(single_env)]
+    else:
+        names = f"Neither {multi_env} nor {single_env}" if single_env else multi_env
+        found = "found" if single_env else "not found"
+        raise ValueError(f"{names} {found} in environment variables. Please set one in your .env file.")
+    if not keys:
+        raise ValueError(f"No API keys found in {multi_env}.")
+    return keys
+
+
+def sdk_installed(module):
+    """
+    Check that an SDK module can be imported, without importing it.
+
+    The full dotted path is looked up: 'google' is a namespace package that
+    other Google libraries install too, so finding it says nothing about
+    'google.generativeai'. Only the parent packages get imported.
+    """
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        # A parent package is missing
+        return False
+
+
+class Provider:
+    """
+    Base class for model adapters.
+
+    Subclasses set `name`, `label`, `model`, the key env var names, and
+    implement call(). Every request is routed through a KeyPool (see
+    rate_limiter.py) that picks the healthiest key and paces requests;
+    set <NAME>_RPM to give each key a request-per-minute budget.
+
+    stream / max_output_bytes / max_output_tokens default to $<NAME>_STREAM,
+    $<NAME>_MAX_OUTPUT_BYTES and $<NAME>_MAX_OUTPUT_TOKENS. If `model_env`
+    is set, that variable overrides `model`; it is read when the adapter is
+    created, i.e. after the scripts have loaded `.env`.
+    """
+
+    name = None
+    label = None
+    model = None
+    model_env = None
+    params = {}
+    keys_env = None
+    key_env = None
+    # Request parameter that caps the completion length, if the API has one
+    max_tokens_param = None
+    supports_streaming = False
+    # SDK module, imported on first use (see sdk)
+    sdk_module = None
+
+    def __init__(self, api_keys=None, concurrency=None, requests_per_minute=None, stream=None,
+                 max_output_bytes=None, max_output_tokens=None, pool_size=None, keepalive=None):
+        if self.sdk_module and not sdk_installed(self.sdk_module):
+            raise ImportError(f"{self.label} needs the '{self.sdk_module}' package; install it with pip.")
+        prefix = self.name.upper()
+        if self.model_env:
+            self.model = os.getenv(self.model_env, self.model)
+        self.api_keys = list(api_keys) if api_keys else load_api_keys(self.keys_env, self.key_env)
+        self.concurrency = concurrency or int(os.getenv(f"{prefix}_CONCURRENCY", '4'))
+        rpm = requests_per_minute or os.getenv(f"{prefix}_RPM")
+        self.key_pool = KeyPool(len(self.api_keys), requests_per_minute=float(rpm) if rpm else None)
+        self.clients = {}
+        self.client_lock = threading.Lock()
+        self.pool_size = int(pool_size or os.getenv(f"{prefix}_POOL_SIZE") or self.concurrency)
+        self.keepalive = float(keepalive or os.getenv(f"{prefix}_KEEPALIVE") or DEFAULT_KEEPALIVE)
+        if stream is None:
+            stream = os.getenv(f"{prefix}_STREAM", '').lower() in ('1', 'true', 'yes')
+        if stream and not self.supports_streaming:
+            raise ValueError(f"{self.label} does not support streaming.")
+        self.stream = stream
+        max_output_bytes = max_output_bytes or os.getenv(f"{prefix}_MAX_OUTPUT_BYTES")
+        self.max_output_bytes = int(max_output_bytes) if max_output_bytes else None
+        max_output_tokens = max_output_tokens or os.getenv(f"{prefix}_MAX_OUTPUT_TOKENS")
+        if max_output_tokens:
+            # The cap is a request parameter, so it is also part of the response cache key
+            self.params = self.limit_output_tokens(dict(self.params), int(max_output_tokens))
+
+    def limit_output_tokens(self, params, limit):
+        """Return `params` with the completion capped at `limit` tokens."""
+        if self.max_tokens_param is None:
+            raise ValueError(f"{self.label} has no output token limit.")
+        params[self.max_tokens_param] = limit
+        return params
+
+    @property
+    def response_column(self):
+        return f"{self.name}_response"
+
+    @property
+    def sdk(self):
+        """The provider SDK module, imported on first use."""
+        return importlib.import_module(self.sdk_module)
+
+    def make_client(self, api_key):
+        """Build an SDK client for one API key."""
+        raise NotImplementedError
+
+    def http_client(self):
+        """
+        A keep-alive connection pool for one key's SDK client, sized by
+        pool_size and keeping idle connections for keepalive seconds.
+        """
+        # The SDK's own httpx Limits type, so the pool matches the httpx it was built with
+        limits = type(self.sdk.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive)
+        return self.sdk.DefaultHttpxClient(limits=limits)
+
+    def client_for(self, index):
+        """Return the client for API key `index`, creating it on first use."""
+        client = self.clients.get(index)
+        if client is None:
+            with self.client_lock:
+                client = self.clients.get(index)
+                if client is None:
+                    client = self.clients[index] = self.make_client(self.api_keys[index])
+        return client
+
+    def close(self):
+        """Close every key's client and its connections."""
+        with self.client_lock:
+            for client in self.clients.values():
+                if hasattr(client, 'close'):
+                    client.close()
+            self.clients.clear()
+
+    def call(self, prompt, key_index):
+        """
+        Send one prompt using API key `key_index`.
+
+        Returns:
+            tuple: (response text, response headers dict or None, usage dict
+                with input_tokens / output_tokens / reasoning_tokens, or None)
+
+        Raises:
+            RateLimited: When the API rejects the request with a rate limit
+        """
+        raise NotImplementedError
+
+    def call_stream(self, prompt, key_index, on_text):
+        """
+        Send one prompt as a streaming request, passing each text chunk to
+        on_text(chunk) as it arrives; stop reading and close the stream as
+        soon as on_text returns False.
+
+        Returns:
+            tuple: (response headers dict or None, usage dict or None)
+
+        Raises:
+            RateLimited: When the API rejects the request with a rate limit
+        """
+        raise NotImplementedError
+
+    def generate(self, prompt, metrics=None):
+        """
+        Sends one prompt and returns the response text.
+        Rate-limited requests are retried on the healthiest key once its
+        cooldown (retry-after or jittered backoff) allows.
+
+        Args:
+            prompt (str): The prompt
+            metrics (dict): Optional request record to fill in; if it holds
+                'ready_at' (time.perf_counter() when the request became ready),
+                'queue_wait' is measured from there
+        """
+        metrics = metrics if metrics is not None else {}
+        metrics['retries'] = 0
+        first_sent = None
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            index = self.key_pool.acquire()
+            sent = time.perf_counter()
+            if first_sent is None:
+                first_sent = sent
+                metrics['queue_wait'] = sent - metrics.pop('ready_at', sent)
+            metrics['key_index'] = index
+            try:
+                if self.stream:
+                    collector = StreamCollector(self.max_output_bytes)
+                    headers, usage = self.call_stream(prompt, index, collector.add)
+                    text, truncated = collector.text().strip(), collector.truncated
+                    usage = dict(usage or {})
+                    if collector.first_chunk_at is not None:
+                        usage['ttfb'] = collector.first_chunk_at - sent
+                else:
+                    text, headers, usage = self.call(prompt, index)
+                    text, truncated = cap_bytes(text, self.max_output_bytes)
+            except RateLimited as e:
+                metrics['retries'] += 1
+                wait = self.key_pool.report_rate_limit(index, e.retry_after, e.headers)
+                print(f"Rate limit hit for {self.label} API key index {index}; "
+                      f"cooling it down for {wait:.1f}s.")
+                continue
+            except Exception:
+                self.key_pool.report_failure(index)
+                metrics['latency'] = time.perf_counter() - first_sent
+                raise
+            finished = time.perf_counter()
+            self.key_pool.report_success(index, headers)
+            usage = dict(usage or {})
+            metrics['ttfb'] = usage.pop('ttfb', finished - sent)
+            metrics['latency'] = finished - first_sent
+            metrics['streamed'] = self.stream
+            metrics['truncated'] = truncated
+            metrics.update(usage)
+            return text
+        metrics['latency'] = time.perf_counter() - first_sent
+        raise RuntimeError(f"{self.label} still rate-limited after {MAX_RATE_LIMIT_RETRIES} retries")
+
+    # --- Batch API (see batch_runner.py) ---
+    # Adapters that support the provider's batch API set supports_batch and
+    # implement the three methods below. Batches are always submitted with
+    # the first API key, since a batch id is only visible to its own account.
+
+    supports_batch = False
+
+    def submit_batch(self, requests):
+        """
+        Submit one batch job.
+
+        Args:
+            requests (list): (custom_id, prompt) pairs
+
+        Returns:
+            str: Batch id
+        """
+        raise NotImplementedError(f"{self.label} does not support batch submission")
+
+    def batch_done(self, batch_id):
+        """Return True once the batch has finished (successfully or not)."""
+        raise NotImplementedError(f"{self.label} does not support batch submission")
+
+    def batch_results(self, batch_id):
+        """Yield (custom_id, response text) for every request in a finished batch."""
+        raise NotImplementedError(f"{self.label} does not support batch submission")
+
+
+class ClaudeProvider(Provider):
+    name = 'claude'
+    label = 'Claude'
+    # Model to use (Claude 4 Sonnet is the latest and most capable model)
+    model = 'claude-sonnet-4-20250514'
+    params = {'max_tokens': 512, 'temperature': 0.7}
+    keys_env = 'ANTHROPIC_API_KEYS'
+    key_env = 'ANTHROPIC_API_KEY'
+    max_tokens_param = 'max_tokens'
+    supports_streaming = True
+    sdk_module = 'anthropic'
+
+    def make_client(self, api_key):
+        return self.sdk.Anthropic(api_key=api_key, http_client=self.http_client(), max_retries=SDK_MAX_RETRIES)
+
+    def call(self, prompt, key_index):
+        try:
+            # Claude API uses messages.create() instead of chat.completions.create();
+            # the raw response exposes the rate-limit headers
+            raw = self.client_for(key_index).messages.with_raw_response.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                **self.params
+            )
+        except self.sdk.RateLimitError as e:
+            raise RateLimited(str(e), headers=dict(e.response.headers)) from e
+        response = raw.parse()
+        usage = {'input_tokens': response.usage.input_tokens, 'output_tokens': response.usage.output_tokens}
+        # Claude response structure is different - content is a list
+        return response.content[0].text.strip(), dict(raw.headers), usage
+
+    def call_stream(self, prompt, key_index, on_text):
+        try:
+            with self.client_for(key_index).messages.stream(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                **self.params
+            ) as stream:
+                for text in stream.text_stream:
+                    if on_text(text) is False:
+                        break
+                message = stream.current_message_snapshot
+                headers = dict(stream.response.headers)
+        except self.sdk.RateLimitError as e:
+            raise RateLimited(str(e), headers=dict(e.response.headers)) from e
+        return headers, {'input_tokens': message.usage.input_tokens, 'output_tokens': message.usage.output_tokens}
+
+    supports_batch = True
+
+    def submit_batch(self, requests):
+        batch = self.client_for(0).messages.batches.create(requests=[
+            {
+                'custom_id': custom_id,
+                'params': {'model': self.model, 'messages': [{"role": "user", "content": prompt}],
+                           **self.params},
+            }
+            for custom_id, prompt in requests
+        ])
+        return batch.id
+
+    def batch_done(self, batch_id):
+        return self.client_for(0).messages.batches.retrieve(batch_id).processing_status == 'ended'
+
+    def batch_results(self, batch_id):
+        for entry in self.client_for(0).messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == 'succeeded':
+                yield entry.custom_id, result.message.content[0].text.strip()
+            else:
+                error = getattr(result, 'error', None)
+                yield entry.custom_id, f"Error: batch request {result.type}" + (f" ({error})" if error else "")
+
+
+class OpenAIProvider(Provider):
+    name = 'openai'
+    label = 'OpenAI'
+    # Using GPT-5 - it's a reasoning model that needs specific handling; OPENAI_MODEL overrides it
+    model = 'gpt-5'
+    model_env = 'OPENAI_MODEL'
+    params = {'reasoning': {'effort': 'medium'}, 'text': {'verbosity': 'medium'}}
+    keys_env = 'OPENAI_API_KEYS'
+    key_env = 'OPENAI_API_KEY'
+    max_tokens_param = 'max_output_tokens'
+    supports_streaming = True
+    sdk_module = 'openai'
+
+    def make_client(self, api_key):
+        return self.sdk.OpenAI(api_key=api_key, http_client=self.http_client(), max_retries=SDK_MAX_RETRIES)
+
+    def call(self, prompt, key_index):
+        try:
+            # GPT-5 uses client.responses.create() with reasoning and verbosity controls
+            raw = self.client_for(key_index).responses.with_raw_response.create(
+                model=self.model, input=prompt, **self.params)
+        except self.sdk.RateLimitError as e:
+            raise RateLimited(str(e), headers=dict(e.response.headers)) from e
+        response = raw.parse()
+        usage = self.usage_from(getattr(response, 'usage', None))
+
+        if getattr(response, 'output_text', None):
+            print(f"✓ GPT-5 response received ({len(response.output_text)} chars)")
+            return response.output_text.strip(), dict(raw.headers), usage
+        print(f"Debug - Full response structure: {response}")
+        # Raised rather than returned so the row is retried instead of cached as a response
+        raise ValueError(OPENAI_EMPTY_OUTPUT)
+
+    def call_stream(self, prompt, key_index, on_text):
+        try:
+            raw = self.client_for(key_index).responses.with_raw_response.create(
+                model=self.model, input=prompt, stream=True, **self.params)
+        except self.sdk.RateLimitError as e:
+            raise RateLimited(str(e), headers=dict(e.response.headers)) from e
+        stream = raw.parse()
+        usage = None
+        received = False
+        try:
+            for event in stream:
+                if event.type == 'response.output_text.delta':
+                    received = received or bool(event.delta)
+                    if on_text(event.delta) is False:
+                        break
+                elif event.type == 'response.completed':
+                    usage = self.usage_from(event.response.usage)
+        finally:
+            stream.close()
+        if not received:
+            # As in call(): the row is retried instead of cached as an empty response
+            raise ValueError(OPENAI_EMPTY_OUTPUT)
+        return dict(raw.headers), usage
+
+    @staticmethod
+    def usage_from(usage):
+        """Token counts of a Responses API usage object (reasoning tokens are part of output)."""
+        if usage is None:
+            return None
+        details = getattr(usage, 'output_tokens_details', None)
+        return {'input_tokens': usage.input_tokens, 'output_tokens': usage.output_tokens,
+                'reasoning_tokens': getattr(details, 'reasoning_tokens', None)}
+
+    supports_batch = True
+
+    def submit_batch(self, requests):
+        client = self.client_for(0)
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': '/v1/responses',
+                        'body': {'model': self.model, 'input': prompt, **self.params}})
+            for custom_id, prompt in requests
+        ]
+        batch_file = client.files.create(file=('batch.jsonl', '\n'.join(lines).encode('utf-8')),
+                                         purpose='batch')
+        batch = client.batches.create(input_file_id=batch_file.id, endpoint='/v1/responses',
+                                      completion_window='24h')
+        return batch.id
+
+    def batch_done(self, batch_id):
+        status = self.client_for(0).batches.retrieve(batch_id).status
+        return status in ('completed', 'failed', 'expired', 'cancelled')
+
+    def batch_results(self, batch_id):
+        client = self.client_for(0)
+        batch = client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry['custom_id'], self.batch_output_text(entry)
+
+    @staticmethod
+    def batch_output_text(entry):
+        """Pull the response text out of one line of a /v1/responses batch output file."""
+        if entry.get('error'):
+            return f"Error: {entry['error'].get('message', entry['error'])}"
+        response = entry.get('response') or {}
+        if response.get('status_code') != 200:
+            return f"Error: batch request failed with status {response.get('status_code')}"
+        texts = [
+            part.get('text', '')
+            for item in response.get('body', {}).get('output', [])
+            if item.get('type') == 'message'
+            for part in item.get('content', [])
+            if part.get('type') == 'output_text'
+        ]
+        return ''.join(texts).strip() or f"Error: {OPENAI_EMPTY_OUTPUT}"
+
+
+class GeminiProvider(Provider):
+    name = 'gemini'
+    label = 'Gemini'
+    model = 'gemini-2.5-pro'
+    keys_env = 'GOOGLE_API_KEYS'
+
+    # We are disabling all safety settings.
+    # This is not recommended for all use cases, but for this specific
+    # task, we assume the prompts are safe and we want to avoid
+    # blocking any responses.
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    ]
+    params = {'safety_settings': safety_settings}
+    supports_streaming = True
+    sdk_module = 'google.generativeai'
+
+    def make_client(self, api_key):
+        # genai.configure() sets one process-global key, so each key gets its own service
+        # client from google.ai.generativelanguage, the library the SDK is built on; every
+        # key can then be in use at the same time. The gRPC channel multiplexes concurrent
+        # requests over one kept-alive connection.
+        glm = importlib.import_module('google.ai.generativelanguage')
+        return glm.GenerativeServiceClient(client_options={'api_key': api_key})
+
+    def make_request(self, prompt):
+        """The GenerateContentRequest for one prompt, with `params` (safety settings, generation config)."""
+        protos = self.sdk.protos
+        return protos.GenerateContentRequest(
+            model=f"models/{self.model}",
+            contents=[protos.Content(role='user', parts=[protos.Part(text=prompt)])],
+            **self.params)
+
+    def limit_output_tokens(self, params, limit):
+        params['generation_config'] = {**params.get('generation_config', {}), 'max_output_tokens': limit}
+        return params
+
+    @staticmethod
+    def rate_limit_error(e):
+        """
+        The SDK has no dedicated rate-limit exception or headers, so check for
+        a 429 and read the retry delay from the error details.
+
+        Returns:
+            RateLimited or None
+        """
+        message = str(e)
+        if "429" in message or "ResourceExhausted" in type(e).__name__:
+            match = GEMINI_RETRY_DELAY.search(message)
+            return RateLimited(message, retry_after=float(match.group(1)) if match else None)
+        return None
+
+    @staticmethod
+    def usage_from(response):
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is None:
+            return None
+        # Gemini counts thinking tokens separately from the answer; both are billed as output
+        thoughts = getattr(metadata, 'thoughts_token_count', 0) or 0
+        return {'input_tokens': metadata.prompt_token_count,
+                'output_tokens': (metadata.candidates_token_count or 0) + thoughts,
+                'reasoning_tokens': thoughts}
+
+    def call(self, prompt, key_index):
+        try:
+            response = self.sdk.types.GenerateContentResponse.from_response(
+                self.client_for(key_index).generate_content(self.make_request(prompt)))
+        except Exception as e:
+            limited = self.rate_limit_error(e)
+            if limited is not None:
+                raise limited from e
+            raise
+        return response.text.strip(), None, self.usage_from(response)
+
+    def call_stream(self, prompt, key_index, on_text):
+        usage = None
+        try:
+            chunks = self.client_for(key_index).stream_generate_content(self.make_request(prompt))
+            for chunk in self.sdk.types.GenerateContentResponse.from_iterator(chunks):
+                # The usage of the last chunk covers the whole response
+                usage = self.usage_from(chunk) or usage
+                if chunk.parts and on_text(chunk.text) is False:
+                    break
+        except Exception as e:
+            limited = self.rate_limit_error(e)
+            if limited is not None:
+                raise limited from e
+            raise
+        return None, usage
+
+
+class FakeProvider(Provider):
+    """
+    Deterministic offline adapter.
+
+    The response depends only on the prompt, and the simulated latency is drawn
+    from a generator seeded by the prompt, so runs are reproducible and need no
+    network access or API quota.
+    """
+
+    name = 'fake'
+    label = 'Fake'
+    model = 'fake-1'
+    max_tokens_param = 'max_tokens'
+    supports_streaming = True
+
+    # Share of the latency spent before the first streamed chunk
+    FIRST_CHUNK_SHARE = 0.2
+    STREAM_CHUNK_CHARS = 64
+
+    def __init__(self, latency=0.0, jitter=0.0, response_chars=800, concurrency=None, **kwargs):
+        self.params = {'response_chars': response_chars}
+        super().__init__(api_keys=['fake-key'], concurrency=concurrency, **kwargs)
+        self.latency = latency
+        self.jitter = jitter
+        self.response_chars = response_chars
+
+    def respond(self, prompt):
+        """Return (response text, simulated latency) for a prompt."""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        rng = random.Random(digest)
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        body = f"[{digest[:8]}] Response to: {prompt} "
+        text = (body * (self.response_chars // len(body) + 1))[:self.response_chars].strip()
+        if 'max_tokens' in self.params:
+            text = ' '.join(text.split(' ')[:self.params['max_tokens']])
+        return text, delay
+
+    @staticmethod
+    def usage_for(prompt, text):
+        # Roughly one token per word, like a real tokenizer on English text
+        return {'input_tokens': len(prompt.split()), 'output_tokens': len(text.split())}
+
+    def call(self, prompt, key_index):
+        text, delay = self.respond(prompt)
+        if delay:
+            time.sleep(delay)
+        return text, None, self.usage_for(prompt, text)
+
+    def call_stream(self, prompt, key_index, on_text):
+        text, delay = self.respond(prompt)
+        chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)]
+        if delay:
+            time.sleep(delay * self.FIRST_CHUNK_SHARE)
+        sent = []
+        for chunk in chunks:
+            sent.append(chunk)
+            if on_text(chunk) is False:
+                break
+            if delay:
+                time.sleep(delay * (1 - self.FIRST_CHUNK_SHARE) / len(chunks))
+        return None, self.usage_for(prompt, ''.join(sent))
+
+    supports_batch = True
+
+    def batch_server(self):
+        """Local stand-in for a provider batch endpoint, created on first use."""
+        if getattr(self, '_batch_server', None) is None:
+            from batch_runner import LocalBatchServer
+            self._batch_server = LocalBatchServer(lambda prompt: self.call(prompt, 0)[0])
+        return self._batch_server
+
+    def submit_batch(self, requests):
+        return self.batch_server().submit(requests)
+
+    def batch_done(self, batch_id):
+        return self.batch_server().done(batch_id)
+
+    def batch_results(self, batch_id):
+        return self.batch_server().results(batch_id)
+
+
+PROVIDERS = {
+    'claude': ClaudeProvider,
+    'gemini': GeminiProvider,
+    'openai': OpenAIProvider,
+    'fake': FakeProvider,
+}
+
+
+def get_provider(name, **kwargs):
+    """
+    Create the adapter registered under `name`.
+
+    Raises:
+        ValueError: If no adapter has that name
+    """
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown provider '{name}'. Choose from: {', '.join(PROVIDERS)}") from None
+    return provider_class(**kwargs)
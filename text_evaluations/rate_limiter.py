@@ -0,0 +1,220 @@
+"""
+Adaptive Rate Limiter
+
+Paces requests across every API key of a provider instead of sleeping for a
+fixed time:
+
+- each key has a token bucket, refilled at the key's request rate (when one
+  is configured) and corrected from the rate-limit headers the API returns;
+- a rate-limited key is put on cooldown for the server's retry-after, or for an
+  exponential backoff with full jitter when the server gives no hint;
+- every request goes to the healthiest key: not cooling down, most tokens
+  left, fewest recent failures.
+
+All classes are thread-safe, since provider calls run in worker threads.
+"""
+
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# Exponential backoff bounds (seconds) when the server gives no retry-after
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP, rng=random):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset value into seconds from now.
+
+    Accepts plain seconds ('12', '0.5'), Go-style durations as sent by OpenAI
+    ('6m0s', '1.5s', '250ms') and RFC 3339 / HTTP dates as sent by Anthropic.
+
+    Returns:
+        float or None: Seconds to wait, or None if the value is not understood
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        scale = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+    for parse in (lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')), parsedate_to_datetime):
+        try:
+            moment = parse(value)
+        except (TypeError, ValueError):
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+    return None
+
+
+def parse_retry_after(headers):
+    """Seconds the server asked us to wait, from retry-after-ms / retry-after headers."""
+    if not headers:
+        return None
+    headers = {key.lower(): value for key, value in headers.items()}
+    if 'retry-after-ms' in headers:
+        seconds = parse_duration(headers['retry-after-ms'])
+        return seconds / 1000 if seconds is not None else None
+    return parse_duration(headers.get('retry-after'))
+
+
+def parse_rate_limit_headers(headers):
+    """
+    Read request-quota headers from OpenAI (x-ratelimit-*) or Anthropic
+    (anthropic-ratelimit-*) responses.
+
+    Returns:
+        dict: Any of 'limit', 'remaining' (ints) and 'reset' (seconds from now)
+    """
+    if not headers:
+        return {}
+    headers = {key.lower(): value for key, value in headers.items()}
+    info = {}
+    for prefix in ('x-ratelimit-', 'anthropic-ratelimit-requests-'):
+        names = {
+            'limit': prefix + ('limit-requests' if prefix == 'x-ratelimit-' else 'limit'),
+            'remaining': prefix + ('remaining-requests' if prefix == 'x-ratelimit-' else 'remaining'),
+            'reset': prefix + ('reset-requests' if prefix == 'x-ratelimit-' else 'reset'),
+        }
+        for field, name in names.items():
+            if name not in headers:
+                continue
+            if field == 'reset':
+                reset = parse_duration(headers[name])
+                if reset is not None:
+                    info['reset'] = reset
+            else:
+                try:
+                    info[field] = int(float(headers[name]))
+                except ValueError:
+                    pass
+    return info
+
+
+class TokenBucket:
+    """
+    Classic token bucket. `rate` is tokens per second; a rate of None means
+    the bucket never runs dry on its own and is only drained by server hints.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else (max(1.0, rate) if rate else 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        elif now >= self.blocked_until:
+            self.tokens = self.capacity
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else 0.0
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds, now):
+        """Hold the bucket empty for `seconds` (server reset / retry-after)."""
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class KeyPool:
+    """
+    Health-aware pool of API keys for one provider.
+
+    acquire() blocks until some key may be used and returns its index;
+    callers then report the outcome with report_success() or
+    report_rate_limit() so the pool can adapt.
+    """
+
+    def __init__(self, key_count, requests_per_minute=None, rng=None):
+        rate = requests_per_minute / 60.0 if requests_per_minute else None
+        self.buckets = [TokenBucket(rate) for _ in range(key_count)]
+        self.failures = [0] * key_count
+        self.rng = rng or random.Random()
+        self.condition = threading.Condition()
+
+    def _score(self, index, now):
+        # Lower is healthier: available sooner, more tokens, fewer recent failures
+        bucket = self.buckets[index]
+        return (bucket.wait_time(now), self.failures[index], -bucket.tokens)
+
+    def acquire(self):
+        """Block until a key is available, take a token from it and return its index."""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                index = min(range(len(self.buckets)), key=lambda i: self._score(i, now))
+                wait = self.buckets[index].wait_time(now)
+                if wait <= 0:
+                    self.buckets[index].take(now)
+                    return index
+                self.condition.wait(timeout=wait)
+
+    def report_success(self, index, headers=None):
+        """Record a successful call and sync the bucket with the server's quota headers."""
+        info = parse_rate_limit_headers(headers)
+        with self.condition:
+            now = time.monotonic()
+            self.failures[index] = 0
+            bucket = self.buckets[index]
+            if 'limit' in info and not bucket.rate:
+                bucket.capacity = max(1.0, float(info['limit']))
+            if 'remaining' in info:
+                bucket.tokens = min(bucket.tokens, float(info['remaining']))
+                if info['remaining'] <= 0 and 'reset' in info:
+                    bucket.block(info['reset'], now)
+            self.condition.notify_all()
+
+    def report_rate_limit(self, index, retry_after=None, headers=None):
+        """
+        Put a rate-limited key on cooldown.
+
+        Returns:
+            float: Cooldown applied, in seconds
+        """
+        retry_after = retry_after if retry_after is not None else parse_retry_after(headers)
+        if retry_after is None:
+            retry_after = parse_rate_limit_headers(headers).get('reset')
+        with self.condition:
+            if retry_after is None:
+                retry_after = backoff_delay(self.failures[index], rng=self.rng)
+            self.failures[index] += 1
+            self.buckets[index].block(retry_after, time.monotonic())
+            self.condition.notify_all()
+        return retry_after
+
+    def report_failure(self, index):
+        """Record a non-rate-limit failure so the key is deprioritised."""
+        with self.condition:
+            self.failures[index] += 1
+            self.condition.notify_all()
@@ -0,0 +1,184 @@
+"""
+Request Metrics
+
+Structured per-request instrumentation for generation runs. Every provider
+call made by prompt_runner.py is recorded as one JSON line in a sidecar file
+(`<output>.metrics.jsonl` by default):
+
+- provider, model, row, prompt_type
+- cached – answered from the response cache, no API call
+- deduplicated – answered by another row's request for the same prompt
+- queue_wait – seconds from the row being ready until its request was sent
+  (provider concurrency limit plus API-key pacing)
+- ttfb – seconds from sending the successful attempt to its first byte; for
+  streamed calls this is the time to the first text chunk, for non-streaming
+  calls it is when the whole response arrived
+- streamed / truncated – whether the response was streamed, and whether it
+  was cut off at the output byte ceiling
+- latency – seconds from the first attempt being sent to the response,
+  including rate-limit retries
+- input_tokens / output_tokens / reasoning_tokens – as reported by the API
+  (output tokens include reasoning tokens)
+- cost_usd – estimated from MODEL_PRICES, when the model is listed
+- retries, key_index, error_class
+
+At the end of a run, summary() reports p50/p95/p99 latency, p50 time to
+first byte, truncated responses, throughput,
+tokens and estimated cost per provider and per provider and prompt_type.
+"""
+
+import json
+import threading
+import time
+from array import array
+
+
+METRICS_SUFFIX = '.metrics.jsonl'
+
+# USD per million (input, output) tokens, list prices at the time of writing.
+# Update these when prices change; models missing here get no cost estimate.
+MODEL_PRICES = {
+    'claude-sonnet-4-20250514': (3.00, 15.00),
+    'gpt-5': (1.25, 10.00),
+    'gemini-2.5-pro': (1.25, 10.00),
+}
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """Estimated request cost in USD, or None if the model or token counts are unknown."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None or input_tokens is None or output_tokens is None:
+        return None
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentiles of a sequence of numbers, or NaNs for an empty one."""
+    if not len(values):
+        return [float('nan')] * len(points)
+    # Imported here so the generation scripts do not pay for NumPy at startup
+    import numpy as np
+    return [float(value) for value in np.percentile(values, points)]
+
+
+class GroupStats:
+    """
+    Running totals of the requests of one provider and prompt_type: counters,
+    plus the latency and time to first byte of every successful call as
+    packed floats (8 bytes each), which is all summary() needs.
+    """
+
+    def __init__(self):
+        self.entries = 0
+        self.calls = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.truncated = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.costed = 0
+        self.started = float('inf')
+        self.finished = float('-inf')
+        self.latencies = array('d')
+        self.ttfbs = array('d')
+
+    def add(self, entry):
+        self.entries += 1
+        if entry.get('deduplicated'):
+            self.deduplicated += 1
+            return
+        if entry.get('cached'):
+            return
+        self.calls += 1
+        self.started = min(self.started, entry['finished_at'] - entry['latency'])
+        self.finished = max(self.finished, entry['finished_at'])
+        self.input_tokens += entry.get('input_tokens') or 0
+        self.output_tokens += entry.get('output_tokens') or 0
+        if entry.get('cost_usd') is not None:
+            self.cost += entry['cost_usd']
+            self.costed += 1
+        if entry.get('error_class'):
+            self.errors += 1
+            return
+        self.latencies.append(entry['latency'])
+        if entry.get('ttfb') is not None:
+            self.ttfbs.append(entry['ttfb'])
+        if entry.get('truncated'):
+            self.truncated += 1
+
+    def merge(self, other):
+        """Add the totals of another group (e.g. every prompt_type of a provider)."""
+        for field in ('entries', 'calls', 'deduplicated', 'errors', 'truncated', 'input_tokens', 'output_tokens',
+                      'cost', 'costed'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.started = min(self.started, other.started)
+        self.finished = max(self.finished, other.finished)
+        self.latencies.extend(other.latencies)
+        self.ttfbs.extend(other.ttfbs)
+        return self
+
+
+class MetricsLog:
+    """
+    Thread-safe JSONL writer for request records. Only per-group totals are
+    kept in memory for the end-of-run summary, not the records themselves,
+    so memory stays flat on long runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        # (provider, prompt_type) -> GroupStats
+        self.groups = {}
+        self.lock = threading.Lock()
+        self.file = open(path, mode='w', encoding='utf-8')
+
+    def record(self, entry):
+        """Append one request record (a dict) to the log."""
+        entry.setdefault('cost_usd', estimate_cost(entry.get('model'), entry.get('input_tokens'),
+                                                   entry.get('output_tokens')))
+        entry.setdefault('finished_at', time.time())
+        with self.lock:
+            self.count += 1
+            group = (entry['provider'], entry.get('prompt_type') or '-')
+            stats = self.groups.get(group)
+            if stats is None:
+                stats = self.groups[group] = GroupStats()
+            stats.add(entry)
+            self.file.write(json.dumps(entry) + '\n')
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def summary(self):
+        """End-of-run report: one line per provider, then per provider and prompt_type."""
+        with self.lock:
+            if not self.count:
+                return "Request metrics: no requests recorded."
+            groups = {}
+            for (provider, prompt_type), stats in self.groups.items():
+                groups[(provider, prompt_type)] = stats
+                groups.setdefault((provider,), GroupStats()).merge(stats)
+            count = self.count
+
+        lines = [f"Request metrics ({count} requests, details in '{self.path}'):",
+                 f"  {'group':<32} {'calls':>6} {'cached':>6} {'dedup':>6} {'errors':>6} {'p50 s':>7} {'p95 s':>7} "
+                 f"{'p99 s':>7} {'ttfb50':>7} {'trunc':>6} {'req/s':>7} {'in tok':>9} {'out tok':>9} {'cost $':>8}"]
+        for group in sorted(groups, key=lambda g: (g[0], len(g), g[1:])):
+            stats = groups[group]
+            p50, p95, p99 = percentiles(stats.latencies)
+            ttfb50, = percentiles(stats.ttfbs, (50,))
+            elapsed = stats.finished - stats.started
+            throughput = stats.calls / elapsed if stats.calls and elapsed > 0 else float('nan')
+            name = ' / '.join(group) if len(group) == 1 else f"  {group[0]} / {group[1]}"
+            lines.append(
+                f"  {name:<32} {stats.calls:>6} {stats.entries - stats.calls - stats.deduplicated:>6} "
+                f"{stats.deduplicated:>6} {stats.errors:>6} "
+                f"{p50:>7.2f} {p95:>7.2f} {p99:>7.2f} {ttfb50:>7.2f} {stats.truncated:>6} {throughput:>7.2f} "
+                f"{stats.input_tokens:>9} {stats.output_tokens:>9} "
+                f"{(f'{stats.cost:.4f}' if stats.costed else '-'):>8}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,140 @@
+"""
+Response Cache
+
+Persistent SQLite cache of model responses, so prompts that have not changed
+since the last run are answered instantly instead of being billed again.
+
+Entries are content-addressed: the key is a SHA-256 hash of the provider name,
+model, prompt text and generation parameters (max_tokens, temperature,
+reasoning effort, ...). Changing any of them produces a new key. When the
+stored responses grow past `max_bytes`, the least recently used entries are
+evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = 'response_cache.sqlite'
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+
+def make_key(provider, model, prompt, params):
+    """
+    Build the cache key for one request.
+
+    Args:
+        provider (str): Provider name, e.g. 'claude'
+        model (str): Model identifier, e.g. 'claude-sonnet-4-20250514'
+        prompt (str): Prompt text
+        params (dict): Generation parameters sent with the request
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps([provider, model, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with hit/miss counters and LRU eviction.
+
+    Safe to share between threads; all access goes through one connection
+    guarded by a lock.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' provider TEXT NOT NULL,'
+            ' model TEXT NOT NULL,'
+            ' response TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created REAL NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self.connection.commit()
+        self.total_bytes = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss."""
+        with self.lock:
+            row = self.connection.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.connection.commit()
+            return row[0]
+
+    def put(self, key, provider, model, response):
+        """Store a response, evicting least recently used entries if over budget."""
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            old = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, provider, model, response, size, now, now))
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute(
+                'SELECT key, size FROM responses ORDER BY last_used LIMIT 100').fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, evictions, entries and bytes currently stored
+        """
+        with self.lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': self.total_bytes,
+        }
+
+    def summary(self):
+        """One-line human-readable summary of stats()."""
+        stats = self.stats()
+        lookups = stats['hits'] + stats['misses']
+        rate = stats['hits'] / lookups if lookups else 0.0
+        return (f"Cache '{self.path}': {stats['hits']} hits, {stats['misses']} misses "
+                f"({rate:.0%} hit rate), {stats['evictions']} evicted, "
+                f"{stats['entries']} entries / {stats['bytes'] / 1024 / 1024:.1f} MB stored.")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Response Exporter
+
+Exports every model response of a merged (or master score) table as plain
+text, for the text-based metric tools, in one of two forms:
+
+- files: one file per response in `llm_responses_txt/`, named like
+  `row0001_id1_barbara_liskov_mentor_persona_claude.txt`. Files are written by
+  a thread pool, each to a temporary name and renamed into place, and a file
+  whose content is unchanged is not rewritten at all.
+- pack: a single `llm_responses.pack` archive holding every response back to
+  back, with an index of (name, offset, length) at the end. ResponsePack
+  reads it through one memory map instead of one open() per response.
+
+Rows are numbered in composite-key order (compared as text, like
+merge_csv_files.py sorts them), so names do not depend on the order of the
+input table.
+
+Usage:
+    python response_export.py merged_csv.csv --files llm_responses_txt
+    python response_export.py merged_csv.csv --pack llm_responses.pack
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from table_io import RESPONSE_SUFFIX, read_table
+
+
+OUTPUT_DIR = 'llm_responses_txt'
+PACK_FILE = 'llm_responses.pack'
+KEY_COLUMNS = ['base_question_id', 'assigned_persona', 'prompt_type']
+
+# Parallel file writes; the work is I/O bound, so threads are enough
+DEFAULT_WORKERS = 16
+
+FILE_NAME_RE = re.compile(r"^row\d{4,}_id.+\.txt$")
+
+# Pack layout: MAGIC, response bytes..., JSON index, then FOOTER (index offset, index length, MAGIC)
+PACK_MAGIC = b'LLMPACK1'
+PACK_FOOTER = struct.Struct('<QQ8s')
+
+
+def slugify(value):
+    """'Barbara Liskov' -> 'barbara_liskov'."""
+    return re.sub(r'[^a-z0-9]+', '_', str(value).lower()).strip('_')
+
+
+def response_entries(df):
+    """
+    Yield (name, text) for every response of a table, in file-name order.
+
+    Args:
+        df (DataFrame): Table with the key columns and `<model>_response` columns
+
+    Returns:
+        generator: (file name, response text) pairs; missing responses are skipped
+    """
+    models = [col[:-len(RESPONSE_SUFFIX)] for col in df.columns if col.endswith(RESPONSE_SUFFIX)]
+    keys = df[KEY_COLUMNS].astype(str)
+    ordered = keys.sort_values(KEY_COLUMNS, kind='mergesort').index
+    columns = {model: df[f"{model}{RESPONSE_SUFFIX}"] for model in models}
+    for number, index in enumerate(ordered, start=1):
+        question_id, persona, prompt_type = keys.loc[index].tolist()
+        prefix = f"row{number:04d}_id{question_id}_{slugify(persona)}_{prompt_type}"
+        for model in models:
+            text = columns[model].loc[index]
+            if isinstance(text, str):
+                yield f"{prefix}_{model}.txt", text
+
+
+def write_if_changed(path, data):
+    """
+    Atomically write `data` to `path` unless the file already holds exactly that.
+
+    Returns:
+        bool: True if the file was written
+    """
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as infile:
+                if infile.read() == data:
+                    return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def export_files(df, directory=OUTPUT_DIR, workers=DEFAULT_WORKERS, prune=False):
+    """
+    Write one text file per response, rewriting only files whose content changed.
+
+    Args:
+        df (DataFrame): Table with `<model>_response` columns
+        directory (str): Output directory (created if missing)
+        workers (int): Parallel writers
+        prune (bool): Also delete response files that are no longer produced
+
+    Returns:
+        dict: 'written', 'unchanged' and 'removed' file counts
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = list(response_entries(df))
+
+    def write(entry):
+        name, text = entry
+        return write_if_changed(os.path.join(directory, name), text.encode('utf-8'))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        written = sum(executor.map(write, entries))
+
+    removed = 0
+    if prune:
+        wanted = {name for name, _ in entries}
+        for name in os.listdir(directory):
+            if FILE_NAME_RE.match(name) and name not in wanted:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return {'written': written, 'unchanged': len(entries) - written, 'removed': removed}
+
+
+def write_pack(df, path=PACK_FILE):
+    """
+    Write every response into a single offset-indexed pack file.
+
+    The pack is written to a temporary name and renamed into place.
+
+    Returns:
+        int: Number of responses packed
+    """
+    index = []
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(PACK_MAGIC)
+        offset = len(PACK_MAGIC)
+        for name, text in response_entries(df):
+            data = text.encode('utf-8')
+            outfile.write(data)
+            index.append((name, offset, len(data)))
+            offset += len(data)
+        index_data = json.dumps(index, ensure_ascii=False).encode('utf-8')
+        outfile.write(index_data)
+        outfile.write(PACK_FOOTER.pack(offset, len(index_data), PACK_MAGIC))
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+class ResponsePack:
+    """
+    Read-only access to a pack file written by write_pack().
+
+    Responses are sliced out of one memory map, so reading all of them costs a
+    single open() no matter how many there are.
+
+        with ResponsePack('llm_responses.pack') as pack:
+            for name, text in pack:
+                ...
+    """
+
+    def __init__(self, path=PACK_FILE):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, index_length, magic = PACK_FOOTER.unpack(self.map[-PACK_FOOTER.size:])
+        if magic != PACK_MAGIC or self.map[:len(PACK_MAGIC)] != PACK_MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a response pack.")
+        entries = json.loads(self.map[index_offset:index_offset + index_length].decode('utf-8'))
+        self.index = {name: (offset, length) for name, offset, length in entries}
+
+    def names(self):
+        return list(self.index)
+
+    def read(self, name):
+        """Return the text of one response by its file name."""
+        offset, length = self.index[name]
+        return self.map[offset:offset + length].decode('utf-8')
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        for name in self.index:
+            yield name, self.read(name)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model responses as text files or a single pack file.")
+    parser.add_argument('input', nargs='?', default='merged_csv.csv', help="Merged responses or score table")
+    parser.add_argument('--files', metavar='DIR', help=f"Write one .txt per response into DIR (e.g. {OUTPUT_DIR})")
+    parser.add_argument('--pack', metavar='PATH', help=f"Write a single indexed pack file (e.g. {PACK_FILE})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Parallel file writers")
+    parser.add_argument('--prune', action='store_true', help="Delete response files that are no longer produced")
+    args = parser.parse_args()
+    if not args.files and not args.pack:
+        parser.error("nothing to do; pass --files DIR and/or --pack PATH")
+
+    df = read_table(args.input)
+    if args.files:
+        counts = export_files(df, args.files, workers=args.workers, prune=args.prune)
+        print(f"✓ '{args.files}': {counts['written']} written, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed.")
+    if args.pack:
+        count = write_pack(df, args.pack)
+        print(f"✓ Packed {count} responses into '{args.pack}' ({os.path.getsize(args.pack) / 1024:.0f} KB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Score Cube
+
+Precomputed aggregates of `master_scores.csv` for analysis and dashboards.
+Every metric column (`<model>_<family>_<field>`) is summarized once per
+category × assigned_persona × prompt_type × model cell as a count, a sum and
+a sum of squares, so means and variances for any grouping are a sum over a
+small dense array rather than a pandas group-by over the whole table.
+
+The cube is cached next to the score table as `<table>.cube.npz`, together
+with the numeric values of every row. When the score table changes, only the
+rows that were added, removed or rescored (matched on the composite key) are
+subtracted from / added to the aggregates; an unchanged table is answered
+from the cache without reading it.
+
+Confidence intervals come from a vectorized bootstrap: each block of
+resamples is a matrix of row weights, multiplied with the per-row
+differences of every comparison and metric at once.
+
+- compare_models – paired model-vs-model differences on the same prompt row
+- compare_personas – each persona prompt type minus the vanilla prompt for
+  the same question and persona, per model
+
+Usage:
+    python score_cube.py master_scores.csv --by prompt_type
+    python score_cube.py master_scores.csv --compare models --by category
+    python score_cube.py master_scores.csv --compare personas --metrics taales_composite readability_flesch
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from master_evaluator import KEY_COLUMNS, METRICS, row_keys
+from table_io import read_metrics, write_table
+
+
+SCORE_FILE = 'master_scores.csv'
+CUBE_SUFFIX = '.cube.npz'
+
+# Bump when the cache layout changes so old caches are rebuilt
+CUBE_VERSION = 1
+
+# Dimensions of the cube, besides model and metric
+GROUP_COLUMNS = ('category', 'assigned_persona', 'prompt_type')
+
+# Metric names without the model prefix, in master_scores order
+METRIC_NAMES = [f"{family}_{field}" for family, fields, _, _ in METRICS for field in fields]
+
+BASELINE_PROMPT_TYPE = 'vanilla'
+BOOTSTRAP_RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+# Bootstrap weights materialized at once (resamples × rows); bounds memory on large tables
+BOOTSTRAP_BLOCK_CELLS = 4_000_000
+
+
+def table_layout(columns):
+    """
+    Models and metrics present in a score table, from its `<model>_<metric>` columns.
+
+    Returns:
+        tuple: (models, metrics), in column order
+    """
+    models, metrics = [], []
+    for column in columns:
+        for metric in METRIC_NAMES:
+            if column.endswith('_' + metric):
+                model = column[:-len(metric) - 1]
+                if model not in models:
+                    models.append(model)
+                if metric not in metrics:
+                    metrics.append(metric)
+    return models, [metric for metric in METRIC_NAMES if metric in metrics]
+
+
+def source_signature(path):
+    """(size, mtime in ns) of a file, used to tell whether a cached cube is stale."""
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def bootstrap_means(samples, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=0):
+    """
+    Percentile bootstrap of the mean of every column of `samples` at once.
+
+    Rows are resampled together, so columns that come from the same rows
+    (e.g. every metric of one comparison) share the same resamples. NaN cells
+    are left out of the mean of their column.
+
+    Args:
+        samples (ndarray): rows × columns
+        resamples (int): Number of bootstrap resamples
+        confidence (float): Width of the interval, e.g. 0.95
+        seed (int): Seed of the resampling generator
+
+    Returns:
+        tuple: (count, mean, low, high) arrays, one value per column
+    """
+    rows, width = samples.shape
+    present = ~np.isnan(samples)
+    values = np.where(present, samples, 0.0)
+    counts = present.sum(axis=0)
+    nan = np.full(width, np.nan)
+    if rows == 0:
+        return counts, nan, nan.copy(), nan.copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = values.sum(axis=0) / counts
+    rng = np.random.default_rng(seed)
+    block = max(1, BOOTSTRAP_BLOCK_CELLS // rows)
+    estimates = np.empty((resamples, width))
+    offsets = np.arange(block)[:, None] * rows
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        draws = rng.integers(0, rows, size=(size, rows))
+        # How often each row was drawn in each resample
+        weights = np.bincount((offsets[:size] + draws).ravel(), minlength=size * rows)
+        weights = weights.reshape(size, rows).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            estimates[start:start + size] = (weights @ values) / (weights @ present)
+    tail = (1 - confidence) / 2
+    low, high = nan.copy(), nan.copy()
+    valid = counts > 0
+    if valid.any():
+        quantiles = np.nanquantile(estimates[:, valid], [tail, 1 - tail], axis=0)
+        low[valid], high[valid] = quantiles
+    return counts, means, low, high
+
+
+class ScoreCube:
+    """
+    Count / sum / sum-of-squares cube over category × persona × prompt type × model × metric.
+
+        cube, _ = load_cube('master_scores.csv')
+        cube.summary(by=['prompt_type'])
+        cube.compare_personas(by=['category'])
+    """
+
+    def __init__(self, models, metrics, levels, keys, questions, codes, values, shift, source=None):
+        self.models = list(models)
+        self.metrics = list(metrics)
+        self.levels = [list(level) for level in levels]
+        self.keys = keys
+        self.questions = questions
+        self.codes = codes
+        self.values = values
+        self.shift = shift
+        self.source = source
+        self.results = {}
+        self.aggregate()
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a cube from a score table.
+
+        Raises:
+            ValueError: If the key or group columns are missing, or keys repeat
+        """
+        models, metrics = table_layout(df.columns)
+        keys, questions, labels, values = cls.frame_rows(df, models, metrics)
+        levels = [list(pd.unique(labels[:, axis])) for axis in range(len(GROUP_COLUMNS))]
+        codes = np.column_stack([pd.Index(level).get_indexer(labels[:, axis])
+                                 for axis, level in enumerate(levels)]).astype(np.int64)
+        with np.errstate(invalid='ignore'):
+            # Sums are kept relative to each metric's mean so variances stay exact
+            shift = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(values.shape[1:])
+        order = np.argsort(keys, kind='stable')
+        return cls(models, metrics, levels, keys[order], questions[order], codes[order].reshape(-1, len(levels)),
+                   values[order], shift)
+
+    @staticmethod
+    def frame_rows(df, models, metrics):
+        """
+        Keys, question ids, group labels and metric values (rows × models × metrics) of a score table.
+        """
+        missing = [column for column in KEY_COLUMNS + list(GROUP_COLUMNS) if column not in df.columns]
+        if missing:
+            raise ValueError(f"A score cube needs the columns {missing}.")
+        keys = np.array(row_keys(df), dtype=str)
+        if len(np.unique(keys)) != len(keys):
+            raise ValueError("The score table repeats composite keys; a cube needs one row per key.")
+        questions = df['base_question_id'].astype(str).to_numpy(dtype=str)
+        labels = df[list(GROUP_COLUMNS)].astype(str).to_numpy(dtype=str).reshape(-1, len(GROUP_COLUMNS))
+        values = np.full((len(df), len(models), len(metrics)), np.nan)
+        for i, model in enumerate(models):
+            for j, metric in enumerate(metrics):
+                column = f"{model}_{metric}"
+                if column in df.columns:
+                    values[:, i, j] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+        return keys, questions, labels, values
+
+    @property
+    def shape(self):
+        return tuple(len(level) for level in self.levels) + (len(self.models), len(self.metrics))
+
+    def aggregate(self):
+        """Recompute every cell of the cube from the row values."""
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self.total = np.zeros(self.shape)
+        self.squares = np.zeros(self.shape)
+        self.accumulate(self.codes, self.values, 1)
+
+    def accumulate(self, codes, values, sign):
+        """Add (sign=1) or remove (sign=-1) the contribution of some rows."""
+        if not len(codes):
+            return
+        cells = tuple(codes.T)
+        present = ~np.isnan(values)
+        shifted = np.where(present, values - self.shift, 0.0)
+        np.add.at(self.count, cells, sign * present.astype(np.int64))
+        np.add.at(self.total, cells, sign * shifted)
+        np.add.at(self.squares, cells, sign * shifted * shifted)
+
+    def update(self, df, complete=False):
+        """
+        Patch the cube with the rows of a score table, matched on the composite key.
+
+        Args:
+            df (DataFrame): Scored rows with the cube's metric columns
+            complete (bool): `df` is the whole table; rows not in it are removed
+
+        Returns:
+            dict: Number of rows 'added', 'changed' and 'removed'
+        """
+        keys, questions, labels, values = self.frame_rows(df, self.models, self.metrics)
+        new_levels = False
+        for axis, level in enumerate(self.levels):
+            for label in pd.unique(labels[:, axis]):
+                if label not in level:
+                    level.append(label)
+                    new_levels = True
+        codes = np.column_stack([pd.Index(level).get_indexer(labels[:, axis])
+                                 for axis, level in enumerate(self.levels)]).astype(np.int64)
+        codes = codes.reshape(-1, len(self.levels))
+
+        position = pd.Index(self.keys).get_indexer(keys)
+        known = position >= 0
+        old_rows = position[known]
+        old_values = self.values[old_rows]
+        same = (old_values == values[known]) | (np.isnan(old_values) & np.isnan(values[known]))
+        changed = ~same.all(axis=(1, 2)) | (self.codes[old_rows] != codes[known]).any(axis=1)
+        changed_rows, changed_from = old_rows[changed], np.flatnonzero(known)[changed]
+        added = np.flatnonzero(~known)
+        removed = np.flatnonzero(~np.isin(self.keys, keys)) if complete else np.array([], dtype=np.int64)
+
+        if not new_levels:
+            self.accumulate(self.codes[changed_rows], self.values[changed_rows], -1)
+            self.accumulate(self.codes[removed], self.values[removed], -1)
+            self.accumulate(codes[changed_from], values[changed_from], 1)
+            self.accumulate(codes[added], values[added], 1)
+        self.codes[changed_rows] = codes[changed_from]
+        self.values[changed_rows] = values[changed_from]
+        self.questions[changed_rows] = questions[changed_from]
+        keep = np.ones(len(self.keys), dtype=bool)
+        keep[removed] = False
+        self.keys = np.concatenate([self.keys[keep], keys[added]])
+        self.questions = np.concatenate([self.questions[keep], questions[added]])
+        self.codes = np.concatenate([self.codes[keep], codes[added]])
+        self.values = np.concatenate([self.values[keep], values[added]])
+        order = np.argsort(self.keys, kind='stable')
+        self.keys, self.questions = self.keys[order], self.questions[order]
+        self.codes, self.values = self.codes[order], self.values[order]
+        if new_levels:
+            self.aggregate()
+        changes = {'added': len(added), 'changed': len(changed_rows), 'removed': len(removed)}
+        if any(changes.values()):
+            self.results.clear()
+        return changes
+
+    def save(self, path):
+        """Write the cube to `path` (.npz), atomically."""
+        arrays = {'version': np.array(CUBE_VERSION), 'models': np.array(self.models, dtype=str),
+                  'metrics': np.array(self.metrics, dtype=str), 'keys': self.keys, 'questions': self.questions,
+                  'codes': self.codes, 'values': self.values, 'shift': self.shift,
+                  'source': self.source if self.source is not None else np.zeros(2, dtype=np.int64)}
+        for axis, level in enumerate(self.levels):
+            arrays[f"levels_{axis}"] = np.array(level, dtype=str)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as outfile:
+            np.savez(outfile, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a cube written by save(), or None if it is missing or from another version.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != CUBE_VERSION:
+                    return None
+                levels = [data[f"levels_{axis}"].tolist() for axis in range(len(GROUP_COLUMNS))]
+                return cls(data['models'].tolist(), data['metrics'].tolist(), levels, data['keys'],
+                           data['questions'], data['codes'], data['values'], data['shift'], source=data['source'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def select(self, models=None, metrics=None):
+        """Indices of the requested models and metrics (all by default)."""
+        def indices(names, known, kind):
+            if names is None:
+                return list(range(len(known)))
+            unknown = [name for name in names if name not in known]
+            if unknown:
+                raise ValueError(f"Unknown {kind} {unknown}; the cube has {known}.")
+            return [known.index(name) for name in names]
+        return indices(models, self.models, 'models'), indices(metrics, self.metrics, 'metrics')
+
+    def group_axes(self, by):
+        by = list(by or [])
+        unknown = [column for column in by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by {unknown}; use {list(GROUP_COLUMNS)}.")
+        return by, [GROUP_COLUMNS.index(column) for column in by]
+
+    def summary(self, by=(), models=None, metrics=None):
+        """
+        Count, mean and variance (ddof=1) of every metric per model and group.
+
+        Args:
+            by (list): Any of GROUP_COLUMNS; the other dimensions are pooled
+            models (list): Models to include (all by default)
+            metrics (list): Metric names without the model prefix (all by default)
+
+        Returns:
+            DataFrame: by columns, model, metric, count, mean, variance; empty cells are left out
+        """
+        key = ('summary', tuple(by or ()), tuple(models or ()), tuple(metrics or ()))
+        if key in self.results:
+            return self.results[key]
+        by, axes = self.group_axes(by)
+        model_index, metric_index = self.select(models, metrics)
+        pooled = tuple(axis for axis in range(len(GROUP_COLUMNS)) if axis not in axes)
+        # Kept dimensions stay in GROUP_COLUMNS order
+        count, total, squares = (array.sum(axis=pooled)[..., model_index, :][..., metric_index]
+                                 for array in (self.count, self.total, self.squares))
+        shift = self.shift[model_index][:, metric_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = shift + total / count
+            variance = np.where(count > 1, np.maximum(squares - total * total / count, 0.0) / (count - 1), np.nan)
+        index = pd.MultiIndex.from_product([self.levels[axis] for axis in sorted(axes)]
+                                           + [[self.models[i] for i in model_index],
+                                              [self.metrics[j] for j in metric_index]],
+                                           names=[GROUP_COLUMNS[axis] for axis in sorted(axes)] + ['model', 'metric'])
+        result = pd.DataFrame({'count': count.ravel(), 'mean': np.where(count > 0, mean, np.nan).ravel(),
+                               'variance': variance.ravel()}, index=index)
+        result = result[result['count'] > 0].reset_index()
+        result = result[by + ['model', 'metric', 'count', 'mean', 'variance']]
+        self.results[key] = result
+        return result
+
+    def bootstrap(self, labels, differences, rows, by, resamples, confidence, seed):
+        """
+        Bootstrap CIs for every column of `differences`, separately within each group of `by`.
+
+        Args:
+            labels (DataFrame): One row describing each column of `differences`
+            differences (ndarray): paired rows × columns
+            rows (ndarray): Cube row whose group labels each paired row takes
+        """
+        by, axes = self.group_axes(by)
+        frames = []
+        if axes:
+            groups = pd.DataFrame(self.codes[rows][:, axes]).groupby(list(range(len(axes)))).indices
+        else:
+            groups = {(): np.arange(len(rows))}
+        for group, members in groups.items():
+            group = group if isinstance(group, tuple) else (group,)
+            counts, means, low, high = bootstrap_means(differences[members], resamples, confidence, seed)
+            frame = labels.copy()
+            for column, axis, code in zip(by, axes, group):
+                frame.insert(len(frame.columns) - len(labels.columns), column, self.levels[axis][code])
+            frame['n'] = counts
+            frame['difference'] = means
+            frame['low'] = low
+            frame['high'] = high
+            frames.append(frame)
+        columns = by + list(labels.columns) + ['n', 'difference', 'low', 'high']
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def compare_models(self, models=None, metrics=None, by=(), resamples=BOOTSTRAP_RESAMPLES,
+                       confidence=CONFIDENCE, seed=0):
+        """
+        Mean paired difference between every two models on the same prompt rows, with bootstrap CIs.
+
+        Returns:
+            DataFrame: by columns, comparison ('claude - gemini'), metric, n, difference, low, high
+        """
+        key = ('models', tuple(models or ()), tuple(metrics or ()), tuple(by or ()), resamples, confidence, seed)
+        if key in self.results:
+            return self.results[key]
+        model_index, metric_index = self.select(models, metrics)
+        pairs = list(itertools.combinations(model_index, 2))
+        values = self.values[:, :, metric_index]
+        differences = np.concatenate([values[:, a] - values[:, b] for a, b in pairs], axis=1) if pairs \
+            else np.empty((len(values), 0))
+        labels = pd.DataFrame([(f"{self.models[a]} - {self.models[b]}", self.metrics[j])
+                               for a, b in pairs for j in metric_index], columns=['comparison', 'metric'])
+        result = self.bootstrap(labels, differences, np.arange(len(self.keys)), by, resamples, confidence, seed)
+        self.results[key] = result
+        return result
+
+    def compare_personas(self, baseline=BASELINE_PROMPT_TYPE, models=None, metrics=None, by=(),
+                         resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=0):
+        """
+        Mean difference of every other prompt type against `baseline` for the same question and
+        persona, per model, with bootstrap CIs.
+
+        Returns:
+            DataFrame: by columns, comparison ('mentor_persona - vanilla'), model, metric, n,
+            difference, low, high
+        """
+        key = ('personas', baseline, tuple(models or ()), tuple(metrics or ()), tuple(by or ()), resamples,
+               confidence, seed)
+        if key in self.results:
+            return self.results[key]
+        prompt_types = self.levels[GROUP_COLUMNS.index('prompt_type')]
+        if baseline not in prompt_types:
+            raise ValueError(f"No '{baseline}' rows to compare against; prompt types are {prompt_types}.")
+        model_index, metric_index = self.select(models, metrics)
+        persona_axis, type_axis = GROUP_COLUMNS.index('assigned_persona'), GROUP_COLUMNS.index('prompt_type')
+        rows = pd.DataFrame({'question': self.questions, 'persona': self.codes[:, persona_axis],
+                             'prompt_type': self.codes[:, type_axis], 'row': np.arange(len(self.keys))})
+        base = rows[rows['prompt_type'] == prompt_types.index(baseline)]
+        frames = []
+        for code, prompt_type in enumerate(prompt_types):
+            if prompt_type == baseline:
+                continue
+            paired = rows[rows['prompt_type'] == code].merge(base, on=['question', 'persona'],
+                                                             suffixes=('', '_base'))
+            treated = self.values[paired['row'].to_numpy()][:, model_index][:, :, metric_index]
+            control = self.values[paired['row_base'].to_numpy()][:, model_index][:, :, metric_index]
+            differences = (treated - control).reshape(len(paired), -1)
+            labels = pd.DataFrame([(f"{prompt_type} - {baseline}", self.models[i], self.metrics[j])
+                                   for i in model_index for j in metric_index],
+                                  columns=['comparison', 'model', 'metric'])
+            frames.append(self.bootstrap(labels, differences, paired['row'].to_numpy(), by, resamples,
+                                         confidence, seed))
+        result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.results[key] = result
+        return result
+
+
+def load_cube(path=SCORE_FILE, cache_path=None, rebuild=False):
+    """
+    The cube of a score table, from its cache when the table is unchanged.
+
+    A stale cache is patched with the rows that changed and written back.
+
+    Args:
+        path (str): Score table (.csv, .parquet, .arrow)
+        cache_path (str): Cube cache; `path + CUBE_SUFFIX` by default
+        rebuild (bool): Ignore the cache and aggregate the whole table
+
+    Returns:
+        tuple: (ScoreCube, changes) where changes is None if the cache was
+        current, else a dict of rows 'added' / 'changed' / 'removed'
+    """
+    cache_path = cache_path or path + CUBE_SUFFIX
+    signature = source_signature(path)
+    cube = None if rebuild else ScoreCube.load(cache_path)
+    if cube is not None and np.array_equal(cube.source, signature):
+        return cube, None
+    df = read_metrics(path, extra_columns=tuple(KEY_COLUMNS) + GROUP_COLUMNS)
+    if cube is not None and (cube.models, cube.metrics) == table_layout(df.columns):
+        changes = cube.update(df, complete=True)
+    else:
+        cube = ScoreCube.from_frame(df)
+        changes = {'added': len(cube.keys), 'changed': 0, 'removed': 0}
+    cube.source = signature
+    cube.save(cache_path)
+    return cube, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate a score table into a cached cube and compare "
+                                                 "models / prompt types with bootstrap CIs.")
+    parser.add_argument('input', nargs='?', default=SCORE_FILE, help="Score table")
+    parser.add_argument('--by', nargs='*', default=[], choices=GROUP_COLUMNS, help="Group by these columns")
+    parser.add_argument('--compare', choices=['models', 'personas'], default=None,
+                        help="Bootstrap model-vs-model or prompt-type-vs-baseline differences")
+    parser.add_argument('--baseline', default=BASELINE_PROMPT_TYPE, help="Prompt type personas are compared to")
+    parser.add_argument('--models', nargs='+', default=None, help="Only these models")
+    parser.add_argument('--metrics', nargs='+', default=None, help="Only these metrics, e.g. taales_composite")
+    parser.add_argument('--resamples', type=int, default=BOOTSTRAP_RESAMPLES, help="Bootstrap resamples")
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE, help="Confidence level of the intervals")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the bootstrap resampling")
+    parser.add_argument('--output', default=None, help="Write the result table here instead of printing it")
+    parser.add_argument('--cache', default=None, help=f"Cube cache (default: <input>{CUBE_SUFFIX})")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the cache and aggregate the whole table")
+    args = parser.parse_args()
+    if args.resamples < 1 or not 0 < args.confidence < 1:
+        parser.error("--resamples must be at least 1 and --confidence between 0 and 1")
+
+    start = time.perf_counter()
+    try:
+        cube, changes = load_cube(args.input, args.cache, args.rebuild)
+        if changes is None:
+            print(f"✓ Cube of '{args.input}' is up to date ({len(cube.keys)} rows).")
+        else:
+            print(f"✓ Updated cube of '{args.input}': {changes['added']} rows added, {changes['changed']} changed, "
+                  f"{changes['removed']} removed.")
+        if args.compare == 'models':
+            result = cube.compare_models(args.models, args.metrics, args.by, args.resamples, args.confidence,
+                                         args.seed)
+        elif args.compare == 'personas':
+            result = cube.compare_personas(args.baseline, args.models, args.metrics, args.by, args.resamples,
+                                           args.confidence, args.seed)
+        else:
+            result = cube.summary(args.by, args.models, args.metrics)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+    if args.output:
+        write_table(result, args.output)
+        print(f"✓ Wrote {len(result)} rows to '{args.output}'.")
+    else:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(result.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    print(f"Done in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Sharded Scoring
+
+Splits the scoring of `merged_csv.csv` into N independent shards so they can
+be scored by separate processes or on separate machines, and merges the
+partial score tables back into a `master_scores.csv` that is byte-identical
+to a single-node master_evaluator.py run.
+
+- split: every row goes to shard hash(composite key) mod N, so the same row
+  always lands in the same shard whatever the row order or table size. Each
+  shard file keeps the row's position in the full table in a `source_row`
+  column.
+- score: a shard is an ordinary merged table, scored with master_evaluator.py
+  (or `score_shards.py score`), incrementally like any other table.
+- merge: the metric columns of every partial score table are placed back at
+  their `source_row` position in the full input table, which is then written
+  exactly as master_evaluator.py writes it. Missing, duplicate or mismatched
+  rows are reported instead of merged. The partials' `.state.sqlite` cells are
+  combined too, so later single-node runs stay incremental.
+
+`run` does all three on one machine with one process per shard.
+
+Usage:
+    python score_shards.py split merged_csv.csv --shards 4 --dir shards
+    python score_shards.py score shards/shard-000-of-004.csv shards/scores-000-of-004.csv
+    python score_shards.py merge merged_csv.csv master_scores.csv shards/scores-*-of-004.csv
+    python score_shards.py run merged_csv.csv master_scores.csv --shards 4
+"""
+
+import argparse
+import glob
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from master_evaluator import (CONCRETENESS_LEXICON, INPUT_FILE, OUTPUT_FILE, STATE_SUFFIX, TAALES_LEXICON,
+                              ScoreState, evaluate, load_lexicons, metric_column_names, response_models,
+                              row_keys)
+from table_io import TABLE_SUFFIXES, read_table, write_table
+
+
+SHARD_DIR = 'shards'
+SOURCE_ROW_COLUMN = 'source_row'
+
+
+def shard_name(index, count, prefix='shard', suffix='.csv'):
+    """'shard-002-of-008.csv' for shard 2 of 8."""
+    return f"{prefix}-{index:03d}-of-{count:03d}{suffix}"
+
+
+def shard_ids(df, count):
+    """
+    Shard of every row: a stable hash of its composite key, modulo `count`.
+
+    Raises:
+        ValueError: If the key columns are missing
+    """
+    keys = row_keys(df)
+    if keys is None:
+        raise ValueError("Sharding needs the composite key columns.")
+    digests = [hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest() for key in keys]
+    return np.array([int.from_bytes(digest, 'little') % count for digest in digests], dtype=np.int64)
+
+
+def split(input_path, count, directory=SHARD_DIR, suffix='.csv'):
+    """
+    Write `count` shard tables of `input_path`, each with a `source_row` column.
+
+    Returns:
+        list: Shard table paths, in shard order (empty shards are written too)
+    """
+    df = read_table(input_path)
+    if SOURCE_ROW_COLUMN in df.columns:
+        raise ValueError(f"'{input_path}' already has a '{SOURCE_ROW_COLUMN}' column.")
+    df[SOURCE_ROW_COLUMN] = np.arange(len(df))
+    shards = shard_ids(df, count)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, shard_name(index, count, suffix=suffix))
+        write_table(df[shards == index], path)
+        paths.append(path)
+    return paths
+
+
+def score_shard(shard_path, output_path, workers=None, concreteness_path=CONCRETENESS_LEXICON,
+                taales_path=TAALES_LEXICON):
+    """Score one shard table; see master_evaluator.evaluate()."""
+    return evaluate(shard_path, output_path, workers=workers, concreteness_path=concreteness_path,
+                    taales_path=taales_path)
+
+
+def merge(input_path, output_path, partial_paths):
+    """
+    Put the partial score tables back together in the row order of `input_path`.
+
+    Args:
+        input_path (str): The full merged responses table that was split
+        output_path (str): Score table to write
+        partial_paths (list): Score tables of the shards
+
+    Returns:
+        int: Number of rows written
+
+    Raises:
+        ValueError: If a row is missing, scored twice, or does not match the input
+    """
+    df = read_table(input_path)
+    models = response_models(df.columns)
+    names = metric_column_names(models)
+    keys = row_keys(df)
+    columns = {name: np.full(len(df), math.nan) for name in names}
+    seen = np.zeros(len(df), dtype=bool)
+    for path in partial_paths:
+        partial = read_table(path)
+        if SOURCE_ROW_COLUMN not in partial.columns:
+            raise ValueError(f"'{path}' is not a shard score table (no '{SOURCE_ROW_COLUMN}' column).")
+        rows = partial[SOURCE_ROW_COLUMN].to_numpy()
+        if len(rows) and (rows.min() < 0 or rows.max() >= len(df)):
+            raise ValueError(f"'{path}' has rows that are not in '{input_path}'.")
+        if seen[rows].any() or len(np.unique(rows)) != len(rows):
+            raise ValueError(f"'{path}' repeats rows that are already merged.")
+        if keys is not None and row_keys(partial) != [keys[row] for row in rows]:
+            raise ValueError(f"'{path}' does not match the keys of '{input_path}'; was it split from another table?")
+        seen[rows] = True
+        for name in names:
+            if name in partial.columns:
+                columns[name][rows] = partial[name].to_numpy(dtype=float)
+    if not seen.all():
+        raise ValueError(f"{int((~seen).sum())} rows of '{input_path}' are in none of the partial score tables.")
+
+    result = df.copy()
+    for name in names:
+        result[name] = columns[name]
+    write_table(result, output_path)
+
+    state = ScoreState(output_path + STATE_SUFFIX)
+    try:
+        state.clear()
+        for path in partial_paths:
+            if os.path.exists(path + STATE_SUFFIX):
+                partial_state = ScoreState(path + STATE_SUFFIX)
+                try:
+                    state.update((key, model, family, fp, version)
+                                 for (key, model, family), (fp, version) in partial_state.load().items())
+                finally:
+                    partial_state.close()
+    finally:
+        state.close()
+    return len(result)
+
+
+def run(input_path, output_path, count, workers_per_shard=1, concreteness_path=CONCRETENESS_LEXICON,
+        taales_path=TAALES_LEXICON, directory=None):
+    """
+    Split, score every shard in its own process, and merge, on this machine.
+
+    Args:
+        directory (str): Where to keep the shard files; a temporary directory
+            (removed afterwards) if None
+
+    Returns:
+        int: Number of rows written
+    """
+    work_dir = directory or tempfile.mkdtemp(prefix='score_shards_')
+    try:
+        shards = split(input_path, count, work_dir)
+        # Compile any stale lexicon index once, before the shard processes map it
+        load_lexicons(concreteness_path, taales_path)
+        partials = [os.path.join(work_dir, shard_name(index, count, prefix='scores')) for index in range(count)]
+        with ProcessPoolExecutor(max_workers=count) as executor:
+            futures = [executor.submit(score_shard, shard, partial, workers_per_shard, concreteness_path,
+                                       taales_path)
+                       for shard, partial in zip(shards, partials)]
+            for future in futures:
+                future.result()
+        return merge(input_path, output_path, partials)
+    finally:
+        if directory is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a merged table in deterministic shards.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = commands.add_parser('split', help="Write the shard tables")
+    split_parser.add_argument('input', nargs='?', default=INPUT_FILE, help="Merged responses table")
+    split_parser.add_argument('--shards', type=int, required=True, help="Number of shards")
+    split_parser.add_argument('--dir', default=SHARD_DIR, help="Directory for the shard tables")
+
+    score_parser = commands.add_parser('score', help="Score one shard table")
+    score_parser.add_argument('shard', help="Shard table written by split")
+    score_parser.add_argument('output', help="Partial score table to write")
+
+    merge_parser = commands.add_parser('merge', help="Merge partial score tables")
+    merge_parser.add_argument('input', help="The full merged responses table that was split")
+    merge_parser.add_argument('output', help="Score table to write")
+    merge_parser.add_argument('partials', nargs='+', help="Partial score tables (glob patterns allowed)")
+
+    run_parser = commands.add_parser('run', help="Split, score and merge on this machine")
+    run_parser.add_argument('input', nargs='?', default=INPUT_FILE, help="Merged responses table")
+    run_parser.add_argument('output', nargs='?', default=OUTPUT_FILE, help="Score table to write")
+    run_parser.add_argument('--shards', type=int, required=True, help="Number of shards (one process each)")
+    run_parser.add_argument('--dir', default=None, help="Keep the shard tables in this directory")
+
+    for sub in (score_parser, run_parser):
+        sub.add_argument('--workers', type=int, default=None,
+                         help="Worker processes per shard (default: all cores for score, 1 for run)")
+        sub.add_argument('--concreteness-lexicon', default=CONCRETENESS_LEXICON,
+                         help="CSV with word, rating columns (or its compiled .lex.npy)")
+        sub.add_argument('--taales-lexicon', default=TAALES_LEXICON,
+                         help="CSV with word, ease, academic columns (or its compiled .lex.npy)")
+    args = parser.parse_args()
+    if getattr(args, 'shards', 1) < 1:
+        parser.error("--shards must be at least 1")
+
+    start = time.perf_counter()
+    if args.command == 'split':
+        paths = split(args.input, args.shards, args.dir)
+        print(f"✓ Split '{args.input}' into {len(paths)} shards in '{args.dir}'.")
+    elif args.command == 'score':
+        rows, computed = score_shard(args.shard, args.output, workers=args.workers,
+                                     concreteness_path=args.concreteness_lexicon, taales_path=args.taales_lexicon)
+        print(f"✓ Scored {rows} rows ({computed} cells) of '{args.shard}' into '{args.output}'.")
+    elif args.command == 'merge':
+        # Patterns like 'scores-*' also match the .state.sqlite sidecars; keep only tables
+        partials = sorted(path for pattern in args.partials for path in (glob.glob(pattern) or [pattern])
+                          if path.lower().endswith(TABLE_SUFFIXES))
+        rows = merge(args.input, args.output, partials)
+        print(f"✓ Merged {len(partials)} partial score tables ({rows} rows) into '{args.output}'.")
+    else:
+        rows = run(args.input, args.output, args.shards, workers_per_shard=args.workers or 1,
+                   concreteness_path=args.concreteness_lexicon, taales_path=args.taales_lexicon,
+                   directory=args.dir)
+        print(f"✓ Scored {rows} rows in {args.shards} shards into '{args.output}'.")
+    print(f"Done in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Table I/O
+
+Reads and writes the response and score tables as CSV or as a columnar format
+(Parquet, or Arrow/Feather), chosen by file extension. In a columnar file each
+column is stored separately, so score and plotting steps can load only the
+numeric metric columns of `master_scores` without parsing the multi-line
+response text at all.
+
+Parquet and Arrow need the optional `pyarrow` package; CSV works without it.
+
+Convert an existing table:
+
+    python table_io.py master_scores.csv master_scores.parquet
+    python table_io.py master_scores.parquet master_scores.csv
+"""
+
+import argparse
+import os
+
+import pandas as pd
+
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather')
+CSV_SUFFIXES = ('.csv',)
+TABLE_SUFFIXES = CSV_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+# Columns describing the prompt rather than a model's response or its scores
+METADATA_COLUMNS = [
+    'base_question_id', 'category', 'base_question',
+    'assigned_persona', 'prompt_type', 'generated_prompt'
+]
+RESPONSE_SUFFIX = '_response'
+
+
+def table_format(path):
+    """
+    Return 'csv', 'parquet' or 'arrow' for a table path.
+
+    Raises:
+        ValueError: For an unrecognised extension
+    """
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix in CSV_SUFFIXES:
+        return 'csv'
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    raise ValueError(f"Unsupported table format '{suffix}' for {path}; use one of {', '.join(TABLE_SUFFIXES)}.")
+
+
+def require_pyarrow(path):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Reading or writing '{path}' needs pyarrow; install it with `pip install pyarrow`.") from None
+
+
+def read_columns(path):
+    """
+    Return the column names of a table without loading its data.
+    """
+    fmt = table_format(path)
+    if fmt == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    require_pyarrow(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    import pyarrow.feather as feather
+    return list(feather.read_table(path, memory_map=True).schema.names)
+
+
+def read_table(path, columns=None):
+    """
+    Load a table, optionally restricted to some columns.
+
+    For Parquet/Arrow only the requested columns are read from disk; for CSV the
+    whole file is still parsed but only the requested columns are kept.
+
+    Args:
+        path (str): .csv, .parquet/.pq or .arrow/.feather file
+        columns (list): Columns to load, or None for all
+
+    Returns:
+        DataFrame: The table
+    """
+    fmt = table_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns, float_precision='round_trip')
+    require_pyarrow(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def write_table(df, path):
+    """
+    Write a table in the format given by the extension of `path`.
+
+    The file is written to a temporary name and renamed into place, so readers
+    never see a half-written table.
+    """
+    fmt = table_format(path)
+    tmp_path = f"{path}.tmp{os.path.splitext(str(path))[1]}"
+    if fmt == 'csv':
+        df.to_csv(tmp_path, index=False)
+    else:
+        require_pyarrow(path)
+        if fmt == 'parquet':
+            df.to_parquet(tmp_path, index=False, compression='zstd')
+        else:
+            df.reset_index(drop=True).to_feather(tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def metric_columns(columns):
+    """
+    Return the score columns of a table: everything except prompt metadata and
+    `*_response` text columns.
+    """
+    return [col for col in columns if col not in METADATA_COLUMNS and not col.endswith(RESPONSE_SUFFIX)]
+
+
+def read_metrics(path, extra_columns=('category', 'assigned_persona', 'prompt_type')):
+    """
+    Load only the numeric metric columns of a score table (plus a few grouping
+    columns), skipping the response text.
+
+    Args:
+        path (str): Score table, e.g. master_scores.parquet
+        extra_columns (tuple): Metadata columns to load alongside the metrics
+
+    Returns:
+        DataFrame: Grouping columns followed by metric columns
+    """
+    columns = read_columns(path)
+    wanted = [col for col in extra_columns if col in columns] + metric_columns(columns)
+    return read_table(path, columns=wanted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a response / score table between CSV and columnar formats.")
+    parser.add_argument('source', help="Table to read (.csv, .parquet, .arrow)")
+    parser.add_argument('destination', help="Table to write (.csv, .parquet, .arrow)")
+    args = parser.parse_args()
+
+    df = read_table(args.source)
+    write_table(df, args.destination)
+    print(f"✓ Wrote {len(df)} rows × {len(df.columns)} columns to '{args.destination}' "
+          f"({os.path.getsize(args.destination) / 1024:.0f} KB, was {os.path.getsize(args.source) / 1024:.0f} KB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Tests for pipeline.py, run with the offline fake provider:
+
+    python -m pytest -q text_evaluations
+"""
+
+import csv
+import os
+import subprocess
+import sys
+
+from prompt_runner import KEY_COLUMNS, PROMPT_COLUMN_NAME
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def fail_scoring(frame):
+    """Stand-in for master_evaluator.score_rows that fails in the scoring process."""
+    raise RuntimeError("scorer crashed")
+
+
+def test_failing_scorer_ends_pipeline_with_error(tmp_path):
+    with open(tmp_path / 'prompts.csv', mode='w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(list(KEY_COLUMNS) + [PROMPT_COLUMN_NAME])
+        for index in range(2000):
+            writer.writerow([f"q{index}", 'persona', 'direct', f"prompt {index}"])
+
+    # Run main() in a child interpreter so a hang fails the test instead of blocking it
+    script = ("import sys, pipeline, test_pipeline\n"
+              "pipeline.score_rows = test_pipeline.fail_scoring\n"
+              "sys.argv = ['pipeline.py'] + sys.argv[1:]\n"
+              "pipeline.main()\n")
+    result = subprocess.run(
+        [sys.executable, '-c', script, '--providers', 'fake', '--input', 'prompts.csv', '--output', 'scores.csv',
+         '--no-cache', '--no-metrics', '--workers', '1', '--queue-size', '4', '--batch-rows', '2'],
+        cwd=tmp_path, env={**os.environ, 'PYTHONPATH': HERE}, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 1, result.stdout + result.stderr
+    assert "Scoring failed" in result.stdout
+    assert not (tmp_path / 'scores.csv').exists()
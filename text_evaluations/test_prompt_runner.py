@@ -0,0 +1,40 @@
+"""
+Tests for prompt_runner.run_prompts, run with the offline fake provider:
+
+    python -m pytest -q text_evaluations
+"""
+
+import asyncio
+
+import pytest
+
+from prompt_runner import PROMPT_COLUMN_NAME, run_prompts
+from providers import FakeProvider
+
+
+def make_rows(count):
+    return [{PROMPT_COLUMN_NAME: f"prompt {index}"} for index in range(count)]
+
+
+def test_run_prompts_hands_rows_back_in_order():
+    seen = []
+    rows = make_rows(20)
+    count = asyncio.run(run_prompts(rows, [FakeProvider(concurrency=4)],
+                                    on_result=lambda index, row: seen.append(index), window=3))
+    assert count == 20
+    assert seen == list(range(20))
+    assert all(row['fake_response'] for row in rows)
+
+
+def test_run_prompts_raises_when_on_result_fails():
+    def on_result(index, row):
+        if index == 5:
+            raise OSError("No space left on device")
+
+    async def run():
+        # A hang would otherwise block the test run forever
+        return await asyncio.wait_for(run_prompts(make_rows(50), [FakeProvider(concurrency=4)],
+                                                  on_result=on_result, window=4), timeout=10)
+
+    with pytest.raises(OSError, match="No space left"):
+        asyncio.run(run())
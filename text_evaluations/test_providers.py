@@ -0,0 +1,115 @@
+"""
+Tests for the provider adapters that need no SDK or network access:
+
+    python -m pytest -q text_evaluations
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from providers import GeminiProvider, OpenAIProvider, StreamCollector
+
+
+class StubStream(list):
+    def close(self):
+        pass
+
+
+def openai_provider(monkeypatch, response=None, events=()):
+    """OpenAI adapter whose client returns `response` (or streams `events`) without any request."""
+    pytest.importorskip('openai')
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    provider = OpenAIProvider()
+
+    def create(stream=False, **params):
+        parsed = StubStream(events) if stream else response
+        return SimpleNamespace(headers={}, parse=lambda: parsed)
+
+    client = SimpleNamespace(responses=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    monkeypatch.setattr(provider, 'client_for', lambda key_index: client)
+    return provider
+
+
+def test_stream_collector_keeps_response_of_exactly_max_bytes():
+    collector = StreamCollector(max_bytes=10)
+    assert collector.add('hello')
+    assert collector.add('world')
+    assert collector.text() == 'helloworld'
+    assert not collector.truncated
+
+
+def test_stream_collector_truncates_past_max_bytes():
+    collector = StreamCollector(max_bytes=10)
+    assert collector.add('hello')
+    assert not collector.add('world!')
+    assert collector.text() == 'helloworld'
+    assert collector.truncated
+
+
+def test_openai_empty_output_is_an_error(monkeypatch):
+    provider = openai_provider(monkeypatch, response=SimpleNamespace(output_text='', usage=None))
+    with pytest.raises(ValueError, match="output_text field is empty"):
+        provider.call('prompt', 0)
+
+
+def test_openai_empty_stream_is_an_error(monkeypatch):
+    provider = openai_provider(monkeypatch, events=[SimpleNamespace(type='response.created')])
+    with pytest.raises(ValueError, match="output_text field is empty"):
+        provider.call_stream('prompt', 0, StreamCollector().add)
+
+
+def test_openai_stream_collects_text(monkeypatch):
+    events = [SimpleNamespace(type='response.output_text.delta', delta=text) for text in ('Hello', ' there')]
+    provider = openai_provider(monkeypatch, events=events)
+    collector = StreamCollector()
+    provider.call_stream('prompt', 0, collector.add)
+    assert collector.text() == 'Hello there'
+
+
+def gemini_provider(monkeypatch, **kwargs):
+    """Gemini adapter whose service client answers every request with 'Hello there' in two chunks."""
+    pytest.importorskip('google.generativeai')
+    monkeypatch.setenv('GOOGLE_API_KEYS', 'key-test')
+    provider = GeminiProvider(**kwargs)
+    protos = provider.sdk.protos
+
+    def answer(text):
+        return protos.GenerateContentResponse(
+            candidates=[{'content': {'parts': [{'text': text}]}, 'finish_reason': 'STOP'}],
+            usage_metadata={'prompt_token_count': 3, 'candidates_token_count': 2})
+
+    requests = []
+    client = SimpleNamespace(
+        generate_content=lambda request: requests.append(request) or answer('Hello there '),
+        stream_generate_content=lambda request: requests.append(request) or iter([answer('Hello'), answer(' there')]))
+    monkeypatch.setattr(provider, 'client_for', lambda key_index: client)
+    return provider, requests
+
+
+def test_gemini_client_per_key(monkeypatch):
+    pytest.importorskip('google.generativeai')
+    monkeypatch.setenv('GOOGLE_API_KEYS', 'key-a,key-b')
+    provider = GeminiProvider()
+    assert provider.client_for(0) is not provider.client_for(1)
+    assert provider.client_for(0) is provider.client_for(0)
+
+
+def test_gemini_call_sends_params(monkeypatch):
+    provider, requests = gemini_provider(monkeypatch, max_output_tokens=64)
+    text, headers, usage = provider.call('prompt', 0)
+    assert text == 'Hello there'
+    assert usage['input_tokens'] == 3
+    request = requests[0]
+    assert request.model == f"models/{provider.model}"
+    assert request.contents[0].parts[0].text == 'prompt'
+    assert len(request.safety_settings) == len(GeminiProvider.safety_settings)
+    assert request.generation_config.max_output_tokens == 64
+
+
+def test_gemini_stream_collects_text(monkeypatch):
+    provider, requests = gemini_provider(monkeypatch)
+    collector = StreamCollector()
+    provider.call_stream('prompt', 0, collector.add)
+    assert collector.text() == 'Hello there'
+    assert requests[0].contents[0].parts[0].text == 'prompt'
@@ -0,0 +1,163 @@
+"""
+Text Kernels
+
+Column-at-a-time counting kernels for the readability and cohesion metrics.
+A whole response column is tokenized into one flat array of word codes (one
+code per distinct word) with the row each word belongs to; word, sentence,
+syllable and connective counts per response then come out of NumPy array
+operations instead of a Python loop per response:
+
+- syllables are counted once per distinct word and gathered by code;
+- connective phrases are matched by comparing shifted code arrays;
+- per-response totals are np.bincount sums over the row array.
+
+Texts that are not scorable (missing, empty or 'Error:' responses) are
+tokenized as empty and get zero counts; `ColumnTokens.valid` marks them.
+"""
+
+import re
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from lexicon_index import hash_words
+
+
+WORD_RE = re.compile(r"[a-z]+(?:['’][a-z]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)|\n\s*\n|\n\s*(?:[-*•]|\d+[.)])\s")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+LETTER_RE = re.compile(r"[a-z]")
+
+# TAACO-style connectives, matched as whole word sequences
+CONNECTIVES = [
+    'accordingly', 'additionally', 'also', 'alternatively', 'although', 'and', 'as a result',
+    'because', 'besides', 'but', 'consequently', 'conversely', 'finally', 'first', 'firstly',
+    'for example', 'for instance', 'furthermore', 'hence', 'however', 'in addition',
+    'in contrast', 'in fact', 'in other words', 'in particular', 'in short', 'in summary',
+    'indeed', 'instead', 'lastly', 'likewise', 'meanwhile', 'moreover', 'nevertheless',
+    'next', 'nonetheless', 'on the other hand', 'or', 'otherwise', 'second', 'secondly',
+    'similarly', 'since', 'so', 'specifically', 'still', 'that is', 'then', 'therefore',
+    'third', 'thus', 'ultimately', 'unless', 'whereas', 'while', 'yet',
+]
+# Longest phrase first, so "on the other hand" wins over a shorter phrase at the same word
+CONNECTIVE_SEQUENCES = sorted((tuple(phrase.split()) for phrase in CONNECTIVES), key=len, reverse=True)
+
+
+def is_scorable(text):
+    """True for a non-empty response that is not a recorded API error."""
+    return isinstance(text, str) and bool(text.strip()) and not text.startswith('Error:')
+
+
+def count_syllables(word):
+    """Heuristic English syllable count (vowel groups, minus a silent final 'e')."""
+    count = len(VOWEL_GROUP_RE.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee', 'ye')) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+class ColumnTokens:
+    """
+    The tokenization of a whole column of responses, computed once and shared
+    by every metric.
+
+    Attributes:
+        lowered (list): The responses in lower case ('' for unscorable ones)
+        valid (ndarray): bool per response, False for unscorable ones
+        rows (ndarray): Response index of every word, in reading order
+        codes (ndarray): Vocabulary index of every word
+        vocabulary (ndarray): Distinct words
+    """
+
+    def __init__(self, texts):
+        texts = list(texts)
+        self.size = len(texts)
+        self.valid = np.fromiter((is_scorable(text) for text in texts), dtype=bool, count=self.size)
+        self.lowered = [text.lower() if ok else '' for text, ok in zip(texts, self.valid)]
+        words = [WORD_RE.findall(text) for text in self.lowered]
+        lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=self.size)
+        self.rows = np.repeat(np.arange(self.size), lengths)
+        codes, vocabulary = pd.factorize(np.array(list(chain.from_iterable(words)), dtype=object))
+        self.codes = codes.astype(np.int64)
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self._hashes = None
+
+    def per_row(self, weights=None):
+        """Sum `weights` (default: 1 per word) over the words of each response."""
+        return np.bincount(self.rows, weights=weights, minlength=self.size)
+
+    @property
+    def hashes(self):
+        """Lexicon hash of every word (see lexicon_index), hashing each distinct word once."""
+        if self._hashes is None:
+            self._hashes = hash_words(self.vocabulary.tolist())[self.codes]
+        return self._hashes
+
+
+def word_counts(tokens):
+    return tokens.per_row().astype(np.int64)
+
+
+def sentence_counts(tokens):
+    """Sentences per response (at least 1): pieces between sentence ends that contain a word."""
+    return np.fromiter(
+        (max(1, sum(1 for piece in SENTENCE_END_RE.split(text) if LETTER_RE.search(piece)))
+         for text in tokens.lowered),
+        dtype=np.int64, count=tokens.size)
+
+
+def syllable_counts(tokens):
+    per_word = np.fromiter(map(count_syllables, tokens.vocabulary), dtype=np.int64,
+                           count=len(tokens.vocabulary))
+    return tokens.per_row(per_word[tokens.codes]).astype(np.int64)
+
+
+def connective_counts(tokens):
+    """
+    Connective phrases per response, matched greedily left to right like a
+    reader would: a phrase's words cannot start another phrase.
+    """
+    codes, rows = tokens.codes, tokens.rows
+    lookup = {word: code for code, word in enumerate(tokens.vocabulary)}
+    match_length = np.zeros(len(codes), dtype=np.int64)
+    for sequence in CONNECTIVE_SEQUENCES:
+        length = len(sequence)
+        if length > len(codes) or any(word not in lookup for word in sequence):
+            continue
+        starts = len(codes) - length + 1
+        # Same row at both ends means the phrase does not run across two responses
+        matched = rows[:starts] == rows[length - 1:]
+        for offset, word in enumerate(sequence):
+            matched &= codes[offset:offset + starts] == lookup[word]
+        matched &= match_length[:starts] == 0
+        match_length[:starts][matched] = length
+
+    accepted = []
+    covered_until = 0
+    for position in np.flatnonzero(match_length):
+        if position >= covered_until:
+            accepted.append(position)
+            covered_until = position + match_length[position]
+    return np.bincount(rows[accepted], minlength=tokens.size).astype(np.int64)
+
+
+def column_counts(texts):
+    """
+    Word, sentence, syllable and connective counts for a column of responses.
+
+    Args:
+        texts (iterable): Responses, e.g. df['claude_response']
+
+    Returns:
+        dict: 'valid' (bool) and 'words', 'sentences', 'syllables',
+            'connectives' (int) arrays, one entry per response
+    """
+    tokens = ColumnTokens(texts)
+    return {
+        'valid': tokens.valid,
+        'words': word_counts(tokens),
+        'sentences': sentence_counts(tokens),
+        'syllables': syllable_counts(tokens),
+        'connectives': connective_counts(tokens),
+    }